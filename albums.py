@@ -0,0 +1,29 @@
+from typing import List, Tuple
+
+from telegram.constants import MediaGroupLimit
+
+from config import MAX_FILE_SIZE
+from memory_media import media_name, media_size
+from workspace import ALBUM_PHOTO_EXTENSIONS, ALBUM_VIDEO_EXTENSIONS
+
+MEDIA_GROUP_SIZE = MediaGroupLimit.MAX_MEDIA_LENGTH  # Telegram accepts at most 10 photos/videos per album
+ALBUM_EXTENSIONS = ALBUM_PHOTO_EXTENSIONS + ALBUM_VIDEO_EXTENSIONS
+
+
+def fits_album(file_path) -> bool:
+    """Whether a file (path or in-memory media) can go into a media group"""
+    return media_name(file_path).lower().endswith(ALBUM_EXTENSIONS) and media_size(file_path) <= MAX_FILE_SIZE
+
+
+def pack_albums(file_paths: list) -> Tuple[List[list], list]:
+    """Split files into albums of up to MEDIA_GROUP_SIZE, keeping their order, and files sent on their own"""
+    albums = []
+    singles = []
+    for file_path in file_paths:
+        if not fits_album(file_path):
+            singles.append(file_path)
+            continue
+        if not albums or len(albums[-1]) == MEDIA_GROUP_SIZE:
+            albums.append([])
+        albums[-1].append(file_path)
+    return albums, singles
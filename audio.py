@@ -0,0 +1,181 @@
+import asyncio
+import glob
+import logging
+import os
+from typing import Callable, List, Optional
+
+from config import FFMPEG_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+# Codecs Telegram plays as audio, with the container they are sent in
+PLAYABLE_AUDIO = {'mp3': '.mp3', 'aac': '.m4a'}
+TRANSCODE_ARGS = ['-vn', '-c:a', 'libmp3lame', '-b:a', '192k']
+SPLIT_HEADROOM = 0.9  # aim parts below the limit; cuts land on keyframes, not exact sizes
+SPLIT_ATTEMPTS = 3
+THUMBNAIL_SIZE = 320  # Telegram's limit for thumbnail width and height
+
+
+def normalize_codec(codec: Optional[str]) -> Optional[str]:
+    """Map yt-dlp codec strings ('mp4a.40.2', 'opus', ...) to ffmpeg-style names"""
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower()
+    if codec.startswith(('mp3', 'mp4a.40.34')):
+        return 'mp3'
+    if codec.startswith(('mp4a', 'aac')):
+        return 'aac'
+    return codec.split('.')[0]
+
+
+def plan_audio(path: str, download: dict):
+    """Decide how to turn a downloaded file into a Telegram audio file
+
+    Returns (output path, ffmpeg codec args), with args None when the file
+    can be sent as it is. Playable codecs are copied into the right
+    container; anything else is transcoded to MP3.
+    """
+    codec = normalize_codec(download.get('acodec'))
+    has_video = download.get('vcodec') not in (None, 'none')
+    base, ext = os.path.splitext(path)
+    if codec in PLAYABLE_AUDIO:
+        target_ext = PLAYABLE_AUDIO[codec]
+        if ext.lower() == target_ext and not has_video:
+            return path, None
+        output = base + target_ext
+        if output == path:
+            output = f"{base}.audio{target_ext}"
+        return output, ['-vn', '-c:a', 'copy']
+    return base + '.mp3', TRANSCODE_ARGS
+
+
+async def probe_duration(path: str) -> Optional[float]:
+    """Duration of a media file in seconds according to ffprobe, or None"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1', path,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+    except OSError as e:
+        logger.warning(f"Failed to run ffprobe on {path}: {e}")
+        return None
+    try:
+        return float(stdout.decode().strip())
+    except ValueError:
+        return None
+
+
+class FFmpegRunner:
+    """Runs ffmpeg as separate processes, at most one per CPU at a time"""
+
+    def __init__(self, processes: int = FFMPEG_PROCESSES):
+        self.processes = processes
+        self._slots = asyncio.Semaphore(processes)
+        self.active = 0
+        self.remuxed = 0
+        self.transcoded = 0
+        self.skipped = 0
+        self.split = 0
+        self.faststarted = 0
+
+    async def run(self, input_path: str, output_path: str, args: list, duration: Optional[float] = None,
+                  on_progress: Optional[Callable[[float], None]] = None, input_args: tuple = ()):
+        """Convert input_path to output_path, reporting the completed fraction"""
+        async with self._slots:
+            process = None
+            stderr_task = None
+            self.active += 1
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1', '-y',
+                    *input_args, '-i', input_path, *args, output_path,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+                stderr_task = asyncio.create_task(process.stderr.read())
+                async for line in process.stdout:
+                    key, _, value = line.decode(errors='ignore').strip().partition('=')
+                    # out_time_us (out_time_ms on older builds) is in microseconds
+                    if key in ('out_time_us', 'out_time_ms') and value.isdigit() and duration and on_progress:
+                        on_progress(min(int(value) / 1_000_000 / duration, 1.0))
+                stderr = await stderr_task
+                returncode = await process.wait()
+            except BaseException:
+                if stderr_task is not None:
+                    stderr_task.cancel()
+                if process is not None and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+            finally:
+                self.active -= 1
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed ({returncode}): {stderr.decode(errors='ignore')[-500:]}")
+
+    async def extract_audio(self, path: str, download: dict, duration: Optional[float] = None,
+                            on_progress: Optional[Callable[[float], None]] = None) -> str:
+        """Return a Telegram-playable audio file for a download, copying the stream when possible"""
+        output, args = plan_audio(path, download)
+        if args is None:
+            self.skipped += 1
+            return path
+        await self.run(path, output, args, duration, on_progress)
+        if args is TRANSCODE_ARGS:
+            self.transcoded += 1
+        else:
+            self.remuxed += 1
+        return output
+
+    async def split_video(self, path: str, max_size: int, duration: Optional[float] = None,
+                          on_progress: Optional[Callable[[float], None]] = None) -> List[str]:
+        """Cut a video into sequential parts under max_size without re-encoding
+
+        The segment muxer can only cut on keyframes, so part sizes are checked
+        and the cut is redone with shorter parts when one comes out too big.
+        """
+        duration = duration or await probe_duration(path)
+        if not duration:
+            raise RuntimeError(f"Unknown duration, cannot split {path}")
+        base, ext = os.path.splitext(path)
+        segment_time = duration * max_size * SPLIT_HEADROOM / os.path.getsize(path)
+        for _ in range(SPLIT_ATTEMPTS):
+            for old in glob.glob(glob.escape(base) + '.part*' + ext):
+                os.remove(old)
+            await self.run(path, f"{base}.part%03d{ext}", [
+                '-map', '0', '-c', 'copy', '-f', 'segment', '-segment_time', f"{segment_time:.3f}",
+                '-reset_timestamps', '1', '-segment_format_options', 'movflags=+faststart',
+            ], duration, on_progress)
+            parts = sorted(glob.glob(glob.escape(base) + '.part*' + ext))
+            largest = max((os.path.getsize(part) for part in parts), default=0)
+            if parts and largest <= max_size:
+                self.split += 1
+                return parts
+            segment_time *= max_size * SPLIT_HEADROOM / max(largest, 1)
+        raise RuntimeError(f"Could not split {path} into parts under {max_size} bytes")
+
+    async def faststart(self, path: str, duration: Optional[float] = None):
+        """Move an MP4's index in front of the media data in place, so playback can start while loading"""
+        base, ext = os.path.splitext(path)
+        output = f"{base}.faststart{ext}"
+        await self.run(path, output, ['-map', '0', '-c', 'copy', '-movflags', '+faststart'], duration)
+        os.replace(output, path)
+        self.faststarted += 1
+
+    async def thumbnail(self, path: str, output: str, at: float = 0.0):
+        """Write a small JPEG of the frame at `at` seconds"""
+        await self.run(path, output, [
+            '-frames:v', '1', '-vf', f"scale={THUMBNAIL_SIZE}:{THUMBNAIL_SIZE}:force_original_aspect_ratio=decrease",
+            '-q:v', '5',
+        ], input_args=('-ss', f"{at:.3f}"))
+
+    def stats(self) -> dict:
+        return {
+            'processes': self.processes,
+            'active': self.active,
+            'remuxed': self.remuxed,
+            'transcoded': self.transcoded,
+            'skipped': self.skipped,
+            'split': self.split,
+            'faststarted': self.faststarted,
+        }
@@ -1,19 +1,50 @@
 import os
 import asyncio
+import contextlib
+import copy
 import logging
 import time
-import re
+import shutil
+import signal
+import threading
+from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict
 import psutil
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Chat, Message, Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 
 import yt_dlp
 import instaloader
 from config import *
+from executor import DownloadExecutor
+from progress import ProgressReporter
+from ratelimit import TelegramRateLimiter
+from info_cache import InfoCache, slim_info
+from formats import AUTO_QUALITY, build_quality_options, format_size
+from file_cache import FileIdCache
+from profile_index import ProfileIndex
+from workspace import JobWorkspace, ALBUM_VIDEO_EXTENSIONS
+from albums import MEDIA_GROUP_SIZE, pack_albums
+from instagram_pipeline import ProfilePipeline
+from youtube_playlist import PlaylistPipeline
+from bulk import BatchPipeline
+from urls import classify, find_media_urls
+from instagram_pool import InstagramPool
+from job_store import JobStore
+from job_queue import create_job_queue
+from session_store import Session, create_session_store
+from session_manager import SessionManager
+from scheduler import JobScheduler
+from segmented import SegmentedYoutubeDL
+from audio import FFmpegRunner
+from video import prepare_video
+from memory_media import MemoryBudget, fetch_post_media, media_content, media_name, media_size, release_media
+import database
+import webhook
 
 # Setup logging
 logging.basicConfig(
@@ -22,13 +53,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global variables to track user sessions
-user_sessions: Dict[int, Dict[str, Any]] = {}
+# Containers the segment muxer can cut without re-encoding
+SPLITTABLE_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.webm')
+PART_CAPTION = "✂️ Part {}/{}"
+
+# Error report context per job kind
+JOB_ERROR_CONTEXTS = {
+    'youtube': "YouTube download failed",
+    'instagram_post': "Instagram download failed",
+    'instagram_profile': "Instagram profile download failed",
+    'bulk': "Bulk download failed",
+}
+
+# Rough sizes used to rank jobs before anything is downloaded
+INSTAGRAM_POST_SIZE_ESTIMATE = 8 * 1024 * 1024
+YOUTUBE_VIDEO_SIZE_ESTIMATE = 20 * 1024 * 1024
+
+# yt-dlp options shared by metadata extraction and downloads
+YDL_BASE_OPTS = {
+    'headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/117.0 Safari/537.36'
+    },
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/117.0 Safari/537.36'
+    },
+    'nocheckcertificate': True,
+    'ignoreerrors': True,
+    # watch?v=...&list=... means the video; playlists are opened explicitly
+    'noplaylist': True,
+}
+
+
+class DeliveryFailed(Exception):
+    """A job ended without delivering anything; the user has already been told why"""
+
 
 class MediaDownloaderBot:
     def __init__(self):
-        self.app = Application.builder().token(BOT_TOKEN).build()
-        self.setup_handlers()
+        self.rate_limiter = TelegramRateLimiter()
+        builder = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .rate_limiter(self.rate_limiter)
+            .concurrent_updates(UPDATE_CONCURRENCY)
+            .post_init(self.post_init)
+            .post_stop(self.post_stop)
+            .post_shutdown(self.post_shutdown)
+        )
+        if BOT_API_URL:
+            # Self-hosted Bot API server: uploads up to 2000MB
+            builder = builder.base_url(BOT_API_URL).local_mode(BOT_API_LOCAL_MODE)
+            if BOT_API_FILE_URL:
+                builder = builder.base_file_url(BOT_API_FILE_URL)
+        self.app = builder.build()
+        self.executor = DownloadExecutor()
+        # Quality menus never wait behind long downloads
+        self.metadata_executor = DownloadExecutor(METADATA_WORKERS, name="metadata")
+        self.progress = ProgressReporter(self.app.bot)
+        self.info_cache = InfoCache()
+        self.info_inflight: Dict[str, list] = {}  # key -> [extraction task, waiter count]
+        self.db = database.connect()
+        self.file_cache = FileIdCache(self.db)
+        self.profile_index = ProfileIndex(self.db)
+        self.instagram_pool = InstagramPool()
+        self.memory_budget = MemoryBudget()
+        self.ffmpeg = FFmpegRunner()
+        self.jobs = JobStore(self.db)
+        self.job_queue = create_job_queue(self.jobs)
+        self.sessions = SessionManager(create_session_store(self.db), on_expire=self.notify_expired)
+        self.info_prefetch: Dict[int, asyncio.Task] = {}  # user_id -> metadata extraction started by this frontend
+        self.job_tasks: Dict[str, asyncio.Task] = {}
+        self.scheduler = JobScheduler()
+        self.stopping = threading.Event()  # tells blocking downloads to stop for a restart
+        self.webhook = None  # webhook.WebhookServer in webhook mode
+        if BOT_ROLE != 'worker':
+            self.setup_handlers()
         
         # Create downloads directory
         os.makedirs(TEMP_DIR, exist_ok=True)
@@ -37,8 +140,10 @@ class MediaDownloaderBot:
         """Setup all command and callback handlers"""
         self.app.add_handler(CommandHandler("start", self.start_command))
         self.app.add_handler(CommandHandler("download", self.download_command))
+        self.app.add_handler(CommandHandler("stats", self.stats_command))
         self.app.add_handler(CallbackQueryHandler(self.button_callback))
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.app.add_handler(MessageHandler(filters.Document.FileExtension("txt"), self.handle_link_file))
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -76,6 +181,72 @@ Choose an option below to get started:
             reply_markup=reply_markup
         )
     
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /stats command (support chat only)"""
+        if str(update.effective_chat.id) != str(SUPPORT_CHAT):
+            return
+        
+        executor_stats = self.executor.stats()
+        metadata_stats = self.metadata_executor.stats()
+        progress_stats = self.progress.stats()
+        info_stats = self.info_cache.stats()
+        file_stats = self.file_cache.stats()
+        rate_stats = self.rate_limiter.stats()
+        pool_stats = self.instagram_pool.stats()
+        job_stats = self.jobs.stats()
+        scheduler_stats = self.scheduler.stats()
+        memory_stats = self.memory_budget.stats()
+        ffmpeg_stats = self.ffmpeg.stats()
+        session_stats = await self.sessions.stats()
+        lane_lines = "".join(
+            f"  • {lane}: {stats['count']} sent, avg wait {stats['avg_wait']:.2f}s, "
+            f"max {stats['max_wait']:.1f}s, {stats['queued']} queued\n"
+            for lane, stats in rate_stats['lanes'].items()
+        )
+        stats_text = (
+            "📈 *Bot Statistics*\n\n"
+            f"🧩 Role: {BOT_ROLE} ({WORKER_ID}), {session_stats['active']} active sessions, "
+            f"{session_stats['expired']} expired\n"
+            f"⚙️ Workers: {executor_stats['active']}/{executor_stats['workers']} busy\n"
+            f"📥 Queue depth: {executor_stats['queued']}\n"
+            f"🔎 Metadata workers: {metadata_stats['active']}/{metadata_stats['workers']} busy, "
+            f"{metadata_stats['queued']} queued\n"
+            f"✅ Completed jobs: {executor_stats['completed']}\n"
+            f"❌ Failed jobs: {executor_stats['failed']}\n"
+            f"🗃 Stored jobs: {job_stats['running']} running, {job_stats['queued']} queued, "
+            f"{job_stats['done']} done, {job_stats['failed']} failed\n"
+            f"⚖️ Scheduler: {scheduler_stats['running']} running for {scheduler_stats['users']} users, "
+            f"{scheduler_stats['waiting']} waiting; p95 wait {scheduler_stats['small_p95_wait']:.1f}s small / "
+            f"{scheduler_stats['large_p95_wait']:.1f}s large\n"
+            f"🧠 In-memory media: {memory_stats['in_use'] / (1024*1024):.1f}MB in use "
+            f"(peak {memory_stats['peak'] / (1024*1024):.1f}MB of {memory_stats['max_bytes'] / (1024*1024):.0f}MB), "
+            f"{memory_stats['fallbacks']} disk fallbacks\n"
+            f"🎵 ffmpeg: {ffmpeg_stats['active']}/{ffmpeg_stats['processes']} running, "
+            f"{ffmpeg_stats['remuxed']} copied, {ffmpeg_stats['transcoded']} transcoded, "
+            f"{ffmpeg_stats['skipped']} sent as is, {ffmpeg_stats['split']} split, "
+            f"{ffmpeg_stats['faststarted']} made streamable\n"
+            f"🔄 Progress edits: {progress_stats['sent']} sent / "
+            f"{progress_stats['received']} ticks ({progress_stats['skipped']} unchanged)\n"
+            f"🗂 Info cache: {info_stats['entries']} entries, {info_stats['bytes'] / 1024:.0f}KB, "
+            f"{info_stats['hits']} hits / {info_stats['misses']} misses\n"
+            f"📎 File ID cache: {file_stats['entries']} entries, "
+            f"{file_stats['hits']} hits / {file_stats['misses']} misses\n"
+            f"🚦 Rate limiter: {rate_stats['dropped']} progress edits dropped, "
+            f"{rate_stats['retries']} RetryAfter retries\n"
+            f"{lane_lines}"
+            f"📸 Instagram contexts: {pool_stats['busy']}/{pool_stats['contexts']} busy, "
+            f"{pool_stats['resting']} resting, {pool_stats['logged_in']} logged in, "
+            f"{pool_stats['rate_limited']} rate limits\n"
+        )
+        if self.webhook:
+            webhook_stats = self.webhook.stats()
+            stats_text += (
+                f"🌐 Webhook: {webhook_stats['received']} updates received, "
+                f"{webhook_stats['rejected']} rejected\n"
+            )
+        
+        await update.message.reply_text(stats_text, parse_mode=ParseMode.MARKDOWN)
+    
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks"""
         query = update.callback_query
@@ -100,8 +271,16 @@ Choose an option below to get started:
             await self.handle_youtube_quality_selection(query, user_id, data)
         elif data == "ig_confirm_profile":
             await self.handle_instagram_profile_confirm(query, user_id)
+        elif data == "ig_sync_profile":
+            await self.handle_instagram_profile_confirm(query, user_id, sync=True)
         elif data == "ig_cancel_profile":
-            await self.cancel_instagram_profile(query, user_id)
+            await self.cancel_session(query, user_id)
+        elif data.startswith("bulk_format_"):
+            await self.handle_bulk_format_selection(query, user_id, data)
+        elif data.startswith("bulk_quality_") or data == "bulk_start":
+            await self.handle_bulk_start(query, user_id, data)
+        elif data == "bulk_cancel":
+            await self.cancel_session(query, user_id)
     
     async def show_about(self, query):
         """Show about information"""
@@ -197,80 +376,217 @@ Choose an option below to get started:
     
     async def start_youtube_download(self, query, user_id):
         """Start YouTube download process"""
-        user_sessions[user_id] = {
-            'platform': 'youtube',
-            'step': 'waiting_link',
-            'timestamp': time.time(),
-            'chat_id': query.message.chat_id,
-            'message_id': query.message.message_id
-        }
+        # Replaces (and un-schedules) any session the user already had
+        await self.sessions.create(user_id, 'youtube', query.message.chat_id, query.message.message_id)
         
         await query.edit_message_text(
             "🎥 *YouTube Download*\n\n"
             "📎 Please send me a YouTube video URL\n"
-            "⏰ You have 30 seconds to send the link...",
+            f"⏰ You have {DOWNLOAD_TIMEOUT} seconds to send the link...",
             parse_mode=ParseMode.MARKDOWN
         )
-        
-        # Set timeout
-        asyncio.create_task(self.session_timeout(user_id, 30))
     
     async def start_instagram_download(self, query, user_id):
         """Start Instagram download process"""
-        user_sessions[user_id] = {
-            'platform': 'instagram',
-            'step': 'waiting_link',
-            'timestamp': time.time(),
-            'chat_id': query.message.chat_id,
-            'message_id': query.message.message_id
-        }
+        # Replaces (and un-schedules) any session the user already had
+        await self.sessions.create(user_id, 'instagram', query.message.chat_id, query.message.message_id)
         
         await query.edit_message_text(
             "📸 *Instagram Download*\n\n"
             "📎 Please send me an Instagram post or profile URL\n"
-            "⏰ You have 30 seconds to send the link...",
+            f"⏰ You have {DOWNLOAD_TIMEOUT} seconds to send the link...",
             parse_mode=ParseMode.MARKDOWN
         )
-        
-        # Set timeout
-        asyncio.create_task(self.session_timeout(user_id, 30))
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle text messages"""
         user_id = update.message.from_user.id
         text = update.message.text
         
-        if user_id not in user_sessions:
+        # Several links at once skip the per-link menus
+        urls = find_media_urls(text)
+        if len(urls) > 1:
+            await self.start_bulk_download(update, user_id, urls)
+            return
+        
+        session = await self.sessions.get(user_id)
+        if session is None:
             await update.message.reply_text(
                 "❌ No active session. Use /download to start downloading."
             )
             return
         
-        session = user_sessions[user_id]
-        
-        # Check if session is expired
-        if time.time() - session['timestamp'] > DOWNLOAD_TIMEOUT:
-            del user_sessions[user_id]
+        # The reaper may not have got to it yet
+        if session.expired():
+            await self.sessions.end(user_id)
+            self.cancel_prefetch(user_id)
             await update.message.reply_text(
                 "⏰ Session expired. Please try again with /download"
             )
             return
         
-        if session['platform'] == 'youtube' and session['step'] == 'waiting_link':
-            await self.handle_youtube_link(update, user_id, text)
-        elif session['platform'] == 'instagram' and session['step'] == 'waiting_link':
-            await self.handle_instagram_link(update, user_id, text)
+        if session.platform == 'youtube' and session.step == 'waiting_link':
+            await self.handle_youtube_link(update, session, text)
+        elif session.platform == 'instagram' and session.step == 'waiting_link':
+            await self.handle_instagram_link(update, session, text)
+    
+    async def handle_link_file(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle an uploaded .txt file of links"""
+        document = update.message.document
+        if document.file_size and document.file_size > BULK_FILE_MAX_BYTES:
+            await update.message.reply_text(
+                f"❌ File too large. Link lists can be up to {BULK_FILE_MAX_BYTES // 1024}KB."
+            )
+            return
+        file = await context.bot.get_file(document.file_id)
+        text = bytes(await file.download_as_bytearray()).decode('utf-8', errors='ignore')
+        await self.start_bulk_download(update, update.message.from_user.id, find_media_urls(text))
     
-    async def handle_youtube_link(self, update: Update, user_id: int, url: str):
+    async def start_bulk_download(self, update: Update, user_id: int, urls: list):
+        """Collect the links of a message or file and ask for one format for all of them"""
+        items = []
+        seen = set()
+        skipped = 0
+        for url in urls:
+            key = classify(url)
+            if key is None or key.kind not in ('video', 'post'):
+                skipped += 1
+            elif key not in seen:
+                seen.add(key)
+                items.append({'platform': key.platform, 'url': key.url})
+        duplicates = len(urls) - skipped - len(items)
+        
+        if not items:
+            await update.message.reply_text(
+                "❌ No downloadable links found. Bulk mode takes YouTube videos and Instagram posts."
+            )
+            return
+        truncated = max(0, len(items) - BULK_MAX_URLS)
+        items = items[:BULK_MAX_URLS]
+        
+        youtube = sum(1 for item in items if item['platform'] == 'youtube')
+        text = (
+            "📦 *Bulk Download*\n\n"
+            f"🎥 YouTube videos: {youtube}\n"
+            f"📸 Instagram posts: {len(items) - youtube}\n"
+        )
+        if duplicates:
+            text += f"♻️ Duplicates removed: {duplicates}\n"
+        if skipped:
+            text += f"⚠️ Not supported (playlists, profiles, other links): {skipped}\n"
+        if truncated:
+            text += f"✂️ Only the first {BULK_MAX_URLS} links are downloaded\n"
+        
+        if youtube:
+            text += "\n🎯 Choose one format for all videos:"
+            keyboard = [
+                [InlineKeyboardButton("🎥 Video", callback_data="bulk_format_video")],
+                [InlineKeyboardButton("🎵 Audio", callback_data="bulk_format_audio")],
+                [InlineKeyboardButton("📁 File", callback_data="bulk_format_file")],
+            ]
+        else:
+            keyboard = [[InlineKeyboardButton(f"✅ Download {len(items)} Links", callback_data="bulk_start")]]
+        keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data="bulk_cancel")])
+        
+        menu = await update.message.reply_text(
+            text,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        session = await self.sessions.create(user_id, 'bulk', update.message.chat_id, menu.message_id)
+        session.step = 'choosing_format'
+        session.urls = items
+        await self.sessions.save(session)
+    
+    async def handle_bulk_format_selection(self, query, user_id: int, data: str):
+        """Handle the format of a bulk download"""
+        session = await self.sessions.get(user_id)
+        if session is None or session.platform != 'bulk':
+            return
+        session.format = data.split('_')[-1]
+        session.step = 'choosing_quality'
+        # Videos differ, so offer the generic selectors rather than one video's formats
+        session.qualities = build_quality_options({}, session.format, MAX_FILE_SIZE)
+        await self.sessions.save(session)
+        
+        keyboard = [
+            [InlineKeyboardButton(f"📺 {quality}", callback_data=f"bulk_quality_{quality}")]
+            for quality in session.qualities
+        ]
+        await query.edit_message_text(
+            f"🎯 *Format: {session.format.title()}*\n\n"
+            "📊 Choose quality for all videos:",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    
+    async def handle_bulk_start(self, query, user_id: int, data: str):
+        """Schedule all links of a bulk session as one job"""
+        session = await self.sessions.get(user_id)
+        if session is None or session.platform != 'bulk':
+            return
+        params = {'items': session.urls, 'format': session.format, 'ydl_format': None}
+        if data.startswith("bulk_quality_"):
+            option = (session.qualities or {}).get(data[len("bulk_quality_"):])
+            if option is None:
+                return
+            params['ydl_format'] = option['format']
+        
+        await query.edit_message_text(
+            "🚀 *Starting Bulk Download...*\n\n"
+            f"🔗 Links: {len(session.urls)}\n"
+            "⏳ Please wait while we process your request...",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        await self.sessions.end(user_id)
+        self.submit_job('bulk', query.message.chat_id, user_id, params, query.message)
+    
+    async def download_bulk_job(self, job: dict, progress_msg):
+        """Run a stored bulk job, sending every link as soon as it is ready"""
+        chat_id = job['chat_id']
+        params = job['params']
+        delivered = params.setdefault('delivered', [])
+        
+        def on_delivered(url: str):
+            # Remembered in the job so a resumed batch doesn't resend links
+            delivered.append(url)
+            self.jobs.set_params(job['id'], params)
+        
+        with JobWorkspace(job['id'], resumable=True) as workspace:
+            pipeline = BatchPipeline(
+                self, params['items'], chat_id, progress_msg, workspace, params['format'], params['ydl_format'],
+                skip=set(delivered), on_delivered=on_delivered
+            )
+            sent = await pipeline.run()
+        
+        if not sent:
+            raise RuntimeError(f"None of the {pipeline.total} links could be downloaded")
+        text = (
+            "✅ *Bulk Download Complete!*\n\n"
+            f"📤 Sent: {sent} of {pipeline.total} links"
+        )
+        if pipeline.failed:
+            text += f"\n⚠️ Failed: {pipeline.failed} (unavailable or too large)"
+        await self.progress.finish(chat_id, progress_msg.message_id, text)
+    
+    async def handle_youtube_link(self, update: Update, session: Session, url: str):
         """Handle YouTube URL"""
-        if not self.is_youtube_url(url):
+        key = classify(url)
+        if key is None or key.platform != 'youtube':
             await update.message.reply_text(
                 "❌ Invalid YouTube URL. Please send a valid YouTube link."
             )
             return
         
-        user_sessions[user_id]['url'] = url
-        user_sessions[user_id]['step'] = 'choosing_format'
+        # Every spelling of the same video shares one cache entry from here on
+        url = key.url
+        session.url = url
+        session.step = 'choosing_format'
+        await self.sessions.save(session)
+        
+        # Start extracting metadata while the user picks a format
+        self.cancel_prefetch(session.user_id)
+        self.info_prefetch[session.user_id] = self.prefetch_youtube_info(url)
         
         keyboard = [
             [InlineKeyboardButton("🎥 Video", callback_data="yt_format_video")],
@@ -286,23 +602,28 @@ Choose an option below to get started:
             reply_markup=reply_markup
         )
     
-    async def handle_instagram_link(self, update: Update, user_id: int, url: str):
+    async def handle_instagram_link(self, update: Update, session: Session, url: str):
         """Handle Instagram URL"""
-        if not self.is_instagram_url(url):
+        key = classify(url)
+        if key is None or key.platform != 'instagram':
             await update.message.reply_text(
                 "❌ Invalid Instagram URL. Please send a valid Instagram link."
             )
             return
+        if key.kind == 'story':
+            await update.message.reply_text(
+                "❌ Stories can't be downloaded. Please send a post, reel or profile link."
+            )
+            return
         
-        user_sessions[user_id]['url'] = url
+        url = key.url
+        session.url = url
+        await self.sessions.save(session)
         
-        # Check if it's a profile or post
-        if '/p/' in url or '/reel/' in url or '/tv/' in url:
-            # It's a post
-            await self.start_instagram_post_download(update, user_id, url)
+        if key.kind == 'post':
+            await self.start_instagram_post_download(update, session.user_id, url)
         else:
-            # It's likely a profile
-            await self.confirm_instagram_profile_download(update, user_id, url)
+            await self.confirm_instagram_profile_download(update, session.user_id, url)
     
     async def confirm_instagram_profile_download(self, update: Update, user_id: int, url: str):
         """Confirm Instagram profile download"""
@@ -310,13 +631,22 @@ Choose an option below to get started:
             [InlineKeyboardButton("✅ Yes, Download All", callback_data="ig_confirm_profile")],
             [InlineKeyboardButton("❌ Cancel", callback_data="ig_cancel_profile")]
         ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
+        text = (
             "⚠️ *Profile Link Detected*\n\n"
             "This appears to be an Instagram profile link.\n"
             "Do you want to download ALL posts from this account?\n\n"
-            "⚡ This may take a while depending on the number of posts.",
+            "⚡ This may take a while depending on the number of posts."
+        )
+        
+        # Offer an incremental sync when this chat already received the profile
+        username = self.extract_instagram_username(url)
+        if username and self.profile_index.has_history(username, update.effective_chat.id):
+            keyboard.insert(0, [InlineKeyboardButton("🔄 Only New Posts", callback_data="ig_sync_profile")])
+            text += "\n\n🔄 You downloaded this profile before - you can fetch only the new posts."
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(
+            text,
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=reply_markup
         )
@@ -324,36 +654,66 @@ Choose an option below to get started:
     async def handle_youtube_format_selection(self, query, user_id: int, data: str):
         """Handle YouTube format selection"""
         format_type = data.split('_')[-1]  # video, audio, or file
-        user_sessions[user_id]['format'] = format_type
-        user_sessions[user_id]['step'] = 'choosing_quality'
+        session = await self.sessions.get(user_id)
+        if session is None:
+            return
+        session.format = format_type
+        session.step = 'choosing_quality'
         
         # Get available qualities
         try:
-            qualities = await self.get_youtube_qualities(user_sessions[user_id]['url'])
-            keyboard = []
-            
-            for quality, ydl_format in qualities.items():
-                keyboard.append([InlineKeyboardButton(
-                    f"📺 {quality}", 
-                    callback_data=f"yt_quality_{quality}"
-                )])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            qualities = await self.get_youtube_qualities(session, self.info_prefetch.get(user_id))
+            session.qualities = qualities
+            await self.sessions.save(session)
             
             await query.edit_message_text(
                 f"🎯 *Format: {format_type.title()}*\n\n"
                 "📊 Choose quality:",
                 parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
+                reply_markup=self.build_quality_keyboard(qualities)
             )
         except Exception as e:
             await self.handle_error(e, query.message.chat_id, "Failed to get YouTube qualities")
-            del user_sessions[user_id]
+            await self.sessions.end(user_id)
+            self.cancel_prefetch(user_id)
+    
+    def build_quality_keyboard(self, qualities: dict) -> InlineKeyboardMarkup:
+        """Build the quality menu with estimated sizes"""
+        keyboard = []
+        
+        for quality, option in qualities.items():
+            if quality == AUTO_QUALITY:
+                label = f"🎯 Best that fits ({format_size(option['size'])})"
+            else:
+                label = f"📺 {quality} ({format_size(option['size'])})"
+            if option['size'] and option['size'] > MAX_FILE_SIZE:
+                label += " ✂️"  # sent in parts
+            keyboard.append([InlineKeyboardButton(label, callback_data=f"yt_quality_{quality}")])
+        
+        return InlineKeyboardMarkup(keyboard)
     
     async def handle_youtube_quality_selection(self, query, user_id: int, data: str):
         """Handle YouTube quality selection"""
         quality = data.split('_')[-1]
-        user_sessions[user_id]['quality'] = quality
+        session = await self.sessions.get(user_id)
+        if session is None:
+            return
+        qualities = session.qualities or {}
+        option = qualities.get(quality)
+        if option is None:
+            return
+        
+        # Reject choices that could never be uploaded before downloading anything
+        max_size = self.max_download_size(session.format)
+        if option['size'] and option['size'] > max_size:
+            await query.edit_message_text(
+                f"⚠️ *{quality} is too large* ({format_size(option['size'])}, "
+                f"max {max_size / (1024*1024):.0f}MB)\n\n"
+                "📊 Please choose a lower quality:",
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=self.build_quality_keyboard(qualities)
+            )
+            return
         
         await query.edit_message_text(
             "🚀 *Starting Download...*\n\n"
@@ -361,18 +721,47 @@ Choose an option below to get started:
             parse_mode=ParseMode.MARKDOWN
         )
         
-        # Start download
-        asyncio.create_task(self.download_youtube_video(user_id, query.message.chat_id))
+        # A cached upload is re-sent right away, without queueing behind downloads
+        await self.sessions.end(user_id)
+        chat_id = query.message.chat_id
+        video_id = None if self.is_youtube_playlist(session.url) else self.extract_youtube_id(session.url)
+        if video_id and await self.deliver_from_cache(chat_id, video_id, session.format, option['format']):
+            self.cancel_prefetch(user_id)
+            await self.progress.finish(
+                chat_id,
+                query.message.message_id,
+                "✅ *Download Complete!*\n\n"
+                "🎉 All files have been sent successfully!"
+            )
+            return
+        
+        # The job carries everything the download needs from here on
+        params = {
+            'url': session.url,
+            'format': session.format,
+            'quality': quality,
+            'ydl_format': option['format'],
+            'size': option['size'],
+            'playlist': self.is_youtube_playlist(session.url),
+        }
+        self.submit_job('youtube', chat_id, user_id, params, status_msg=query.message,
+                        info_future=self.info_prefetch.pop(user_id, None))
     
-    async def download_youtube_video(self, user_id: int, chat_id: int):
+    async def download_youtube_video(self, job: dict, progress_msg=None, info_future=None):
         """Download YouTube video"""
-        try:
-            session = user_sessions[user_id]
-            url = session['url']
-            format_type = session['format']
-            quality = session['quality']
-            
-            # Setup progress tracking
+        chat_id = job['chat_id']
+        params = job['params']
+        url = params['url']
+        format_type = params['format']
+        ydl_format = params['ydl_format']
+        video_id = self.extract_youtube_id(url)
+        
+        # Re-send by file_id when the same download was uploaded while this job waited
+        if video_id and await self.deliver_from_cache(chat_id, video_id, format_type, ydl_format):
+            return
+        
+        # Setup progress tracking
+        if progress_msg is None:
             progress_msg = await self.app.bot.send_message(
                 chat_id,
                 "📥 *Downloading...*\n\n"
@@ -380,289 +769,670 @@ Choose an option below to get started:
                 "📊 Progress: 0%",
                 parse_mode=ParseMode.MARKDOWN
             )
-            
-            # Configure yt-dlp options
-            ydl_opts = {
-                'outtmpl': f'{TEMP_DIR}/%(title)s.%(ext)s',
-                'progress_hooks': [lambda d: asyncio.create_task(
-                    self.youtube_progress_hook(d, progress_msg, chat_id)
-                )],
-                'headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                    'AppleWebKit/537.36 (KHTML, like Gecko) '
-                    'Chrome/117.0 Safari/537.36'
-                },
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                    'AppleWebKit/537.36 (KHTML, like Gecko) '
-                    'Chrome/117.0 Safari/537.36'
-                },
-                'nocheckcertificate': True,
-                'ignoreerrors': True,
-            }
-            
-            if format_type == 'audio':
-                ydl_opts['format'] = 'bestaudio/best'
-                ydl_opts['postprocessors'] = [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }]
-            elif format_type == 'video':
-                ydl_opts['format'] = YOUTUBE_QUALITIES.get(quality, 'best')
-            else:  # file
-                ydl_opts['format'] = 'best'
-            
-            # Download
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                filename = ydl.prepare_filename(info)
-                
-                await self.app.bot.edit_message_text(
-                    "📥 *Downloading...*\n\n"
-                    f"🎬 Title: {info.get('title', 'Unknown')}\n"
-                    f"⏱️ Duration: {self.format_duration(info.get('duration', 0))}\n"
-                    "🔄 Starting download...",
+            job['message_id'] = progress_msg.message_id
+            self.jobs.set_message(job['id'], progress_msg.message_id)
+        
+        if params.get('playlist'):
+            await self.download_youtube_playlist(job, progress_msg)
+            return
+        
+        # Reuse the metadata extracted for the quality menu
+        info = await self.get_session_info(url, info_future)
+        
+        self.progress.report(
+            chat_id,
+            progress_msg.message_id,
+            "📥 *Downloading...*\n\n"
+            f"🎬 Title: {info.get('title', 'Unknown')}\n"
+            f"⏱️ Duration: {self.format_duration(int(info.get('duration') or 0))}\n"
+            "🔄 Starting download..."
+        )
+        
+        # Keyed by job ID so a restarted job finds its .part files again
+        with JobWorkspace(job['id'], resumable=True) as workspace:
+            file_path, result = await self.download_youtube_file(
+                workspace, workspace.path, url, info, format_type, ydl_format,
+                lambda d: self.youtube_progress_hook(d, chat_id, progress_msg.message_id),
+                lambda fraction: self.progress.report(
                     chat_id,
                     progress_msg.message_id,
-                    parse_mode=ParseMode.MARKDOWN
+                    "🎵 *Converting Audio...*\n\n"
+                    f"📊 Progress: {fraction * 100:.0f}%"
                 )
-                
-                ydl.download([url])
-            
-            # Upload file
-            await self.upload_file_to_telegram(filename, chat_id, progress_msg)
-            
-            # Cleanup
-            if os.path.exists(filename):
-                os.remove(filename)
-            
-            del user_sessions[user_id]
+            )
             
-        except Exception as e:
-            await self.handle_error(e, chat_id, "YouTube download failed")
-            if user_id in user_sessions:
-                del user_sessions[user_id]
+            # Upload file (in parts when it is over the upload limit)
+            messages = await self.upload_media(file_path, chat_id, progress_msg, result)
+            if not messages:
+                raise DeliveryFailed(f"Upload of {url} failed")
+            if video_id:
+                self.file_cache.put(video_id, format_type, ydl_format, self.media_entries(messages))
     
-    async def start_instagram_post_download(self, update: Update, user_id: int, url: str):
-        """Start Instagram post download"""
+    def max_download_size(self, format_type: str) -> int:
+        """Largest download that can still be delivered: videos can be split, audio can't"""
+        return MAX_FILE_SIZE if format_type == 'audio' else MAX_DOWNLOAD_SIZE
+    
+    async def download_youtube_file(self, workspace: JobWorkspace, directory: str, url: str, info,
+                                    format_type: str, ydl_format: str, progress_hook, on_convert=None):
+        """Download one video into a workspace directory
+
+        `info` is the video's extracted metadata, or None to extract it here.
+        Returns the file to upload and yt-dlp's info about the download.
+        """
+        ydl_opts = {
+            **YDL_BASE_OPTS,
+            'outtmpl': os.path.join(directory, '%(title).150B.%(ext)s'),
+            'progress_hooks': [progress_hook],
+            'format': ydl_format,
+            # Guard for formats whose size was unknown when the menu was built
+            'max_filesize': self.max_download_size(format_type),
+            'continuedl': True,
+        }
+        if DOWNLOAD_RATE_LIMIT:
+            ydl_opts['ratelimit'] = DOWNLOAD_RATE_LIMIT
+        
+        # Audio is converted afterwards on the ffmpeg process slots
+        if format_type != 'audio':  # video or file
+            ydl_opts['merge_output_format'] = 'mp4'
+        
+        # Download (blocking yt-dlp calls run on the worker pool)
+        ydl_class = SegmentedYoutubeDL if DOWNLOAD_ENGINE == 'segmented' else yt_dlp.YoutubeDL
+        with ydl_class(ydl_opts) as ydl:
+            if info is not None and info.get('_type', 'video') == 'video':
+                result = await self.executor.run(ydl.process_ie_result, info, download=True)
+            else:
+                result = await self.executor.run(ydl.extract_info, url)
+        
+        downloads = (result or {}).get('requested_downloads') or []
+        files = [download['filepath'] for download in downloads if download.get('filepath')]
+        if not files:
+            raise RuntimeError(f"yt-dlp produced no file for {url}")
+        for file_path in files:
+            workspace.add(file_path)
+        file_path = files[0]
+        
+        if format_type == 'audio':
+            # Copy the audio stream when it is already playable, transcode otherwise
+            file_path = await self.ffmpeg.extract_audio(
+                file_path, downloads[0], (info or result).get('duration'), on_convert
+            )
+            workspace.add(file_path)
+        return file_path, result
+    
+    async def send_youtube_video(self, workspace: JobWorkspace, directory: str, url: str, chat_id: int,
+                                 format_type: str, ydl_format: str, progress_hook) -> bool:
+        """Send one video of a batch from the file_id cache or a fresh download, without a progress message
+
+        Returns whether the video was sent; download errors are raised.
+        """
+        video_id = self.extract_youtube_id(url)
+        if video_id and await self.deliver_from_cache(chat_id, video_id, format_type, ydl_format):
+            return True
         try:
-            progress_msg = await update.message.reply_text(
-                "📥 *Instagram Download*\n\n"
-                "🔄 Initializing download...\n"
-                "📊 Progress: 0%",
-                parse_mode=ParseMode.MARKDOWN
+            file_path, result = await self.download_youtube_file(
+                workspace, directory, url, None, format_type, ydl_format, progress_hook
             )
-            
-            # Download Instagram post
-            await self.download_instagram_content(url, update.message.chat_id, progress_msg, False)
-            
-            del user_sessions[user_id]
-            
-        except Exception as e:
-            await self.handle_error(e, update.message.chat_id, "Instagram download failed")
-            if user_id in user_sessions:
-                del user_sessions[user_id]
+            messages = await self.upload_media(file_path, chat_id, None, result)
+        finally:
+            # Only a few videos of a batch are on disk at a time
+            shutil.rmtree(directory, ignore_errors=True)
+        if not messages:
+            return False
+        if video_id:
+            self.file_cache.put(video_id, format_type, ydl_format, self.media_entries(messages))
+        return True
     
-    async def handle_instagram_profile_confirm(self, query, user_id: int):
+    async def download_youtube_playlist(self, job: dict, progress_msg):
+        """Download a playlist, uploading each video as soon as it is ready"""
+        chat_id = job['chat_id']
+        params = job['params']
+        delivered = params.setdefault('delivered', [])
+        
+        def on_delivered(video_id: str):
+            # Remembered in the job so a resumed playlist doesn't resend videos
+            delivered.append(video_id)
+            self.jobs.set_params(job['id'], params)
+        
+        with JobWorkspace(job['id'], resumable=True) as workspace:
+            pipeline = PlaylistPipeline(
+                self, params['url'], chat_id, progress_msg, workspace, params['format'], params['ydl_format'],
+                skip=set(delivered), on_delivered=on_delivered
+            )
+            uploaded = await pipeline.run()
+        
+        if not uploaded and not delivered:
+            raise RuntimeError(f"No videos could be downloaded from {params['url']}")
+        text = (
+            "✅ *Playlist Complete!*\n\n"
+            f"📃 Playlist: {pipeline.title}\n"
+            f"📤 Uploaded: {len(delivered)} videos"
+        )
+        if pipeline.failed:
+            text += f"\n⚠️ Skipped: {pipeline.failed} (unavailable or too large)"
+        await self.progress.finish(chat_id, progress_msg.message_id, text)
+    
+    async def start_instagram_post_download(self, update: Update, user_id: int, url: str):
+        """Start Instagram post download"""
+        # A cached post is re-sent right away, without queueing behind downloads
+        shortcode = self.extract_instagram_shortcode(url)
+        if shortcode and await self.deliver_from_cache(update.message.chat_id, shortcode, 'post'):
+            await self.sessions.end(user_id)
+            return
+        
+        progress_msg = await update.message.reply_text(
+            "📥 *Instagram Download*\n\n"
+            "🔄 Initializing download...\n"
+            "📊 Progress: 0%",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        
+        await self.sessions.end(user_id)
+        self.submit_job('instagram_post', update.message.chat_id, user_id, {'url': url}, progress_msg)
+    
+    async def handle_instagram_profile_confirm(self, query, user_id: int, sync: bool = False):
         """Handle Instagram profile download confirmation"""
-        url = user_sessions[user_id]['url']
+        session = await self.sessions.get(user_id)
+        if session is None:
+            return
+        url = session.url
         
         await query.edit_message_text(
             "📥 *Instagram Profile Download*\n\n"
-            "🔄 Starting profile download...\n"
-            "⚠️ This may take several minutes...",
+            + ("🔄 Checking for new posts...\n" if sync else "🔄 Starting profile download...\n")
+            + "⚠️ This may take several minutes...",
             parse_mode=ParseMode.MARKDOWN
         )
         
-        try:
-            await self.download_instagram_content(url, query.message.chat_id, query.message, True)
-            del user_sessions[user_id]
-        except Exception as e:
-            await self.handle_error(e, query.message.chat_id, "Instagram profile download failed")
-            if user_id in user_sessions:
-                del user_sessions[user_id]
+        await self.sessions.end(user_id)
+        self.submit_job('instagram_profile', query.message.chat_id, user_id, {'url': url, 'sync': sync},
+                        query.message)
     
-    async def cancel_instagram_profile(self, query, user_id: int):
-        """Cancel Instagram profile download"""
-        del user_sessions[user_id]
+    async def cancel_session(self, query, user_id: int):
+        """Cancel a download waiting for confirmation (profile or bulk)"""
+        await self.sessions.end(user_id)
         await query.edit_message_text(
             "❌ *Download Cancelled*\n\n"
             "Use /download to start a new download.",
             parse_mode=ParseMode.MARKDOWN
         )
     
-    async def download_instagram_content(self, url: str, chat_id: int, progress_msg, is_profile: bool):
-        """Download Instagram content"""
-        L = instaloader.Instaloader(
-            download_videos=True,
-            download_video_thumbnails=False,
-            download_geotags=False,
-            download_comments=False,
-            save_metadata=False,
-            dirname_pattern=TEMP_DIR
+    async def download_instagram_job(self, job: dict, progress_msg):
+        """Run a stored Instagram job"""
+        params = job['params']
+        is_profile = job['kind'] == 'instagram_profile'
+        skip = None
+        if is_profile and job['attempts'] > 1:
+            # Resumed after a restart: don't resend posts that already arrived
+            username = self.extract_instagram_username(params['url'])
+            skip = self.profile_index.seen(username, job['chat_id'])
+        delivered = await self.download_instagram_content(
+            params['url'], job['chat_id'], progress_msg, is_profile, sync=params.get('sync', False), skip=skip,
+            workspace_id=job['id']
         )
-        
-        if is_profile:
-            # Profile download
-            profile_name = url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
-            profile = instaloader.Profile.from_username(L.context, profile_name)
-            
-            post_count = 0
-            for post in profile.get_posts():
-                post_count += 1
-                await self.app.bot.edit_message_text(
-                    f"📥 *Instagram Profile Download*\n\n"
-                    f"👤 Profile: {profile.username}\n"
-                    f"📊 Downloaded: {post_count} posts\n"
-                    f"🔄 Downloading post {post_count}...",
+        if not is_profile and not delivered:
+            raise DeliveryFailed(f"Upload of {params['url']} failed")
+    
+    async def download_instagram_content(self, url: str, chat_id: int, progress_msg, is_profile: bool,
+                                         sync: bool = False, skip=None, workspace_id: str = None) -> bool:
+        """Download Instagram content (with sync, only profile posts not delivered before)
+
+        Returns whether a single post was sent; `progress_msg` may be None
+        when the caller reports progress itself. `workspace_id` names the
+        working directory after the job, so a worker's startup sweep keeps it.
+        """
+        shortcode = None if is_profile else self.extract_instagram_shortcode(url)
+        if shortcode and await self.deliver_from_cache(chat_id, shortcode, 'post'):
+            if progress_msg:
+                await self.progress.finish(
                     chat_id,
                     progress_msg.message_id,
-                    parse_mode=ParseMode.MARKDOWN
+                    "✅ *Download Complete!*\n\n"
+                    "🎉 All files have been sent successfully!"
                 )
-                
-                L.download_post(post, target=profile.username)
-                
-                if post_count >= 50:  # Limit to prevent spam
-                    break
-        else:
-            # Single post download
-            shortcode = self.extract_instagram_shortcode(url)
-            post = instaloader.Post.from_shortcode(L.context, shortcode)
-            L.download_post(post, target="single_post")
+            return True
         
-        # Find and upload downloaded files
-        await self.upload_instagram_files(chat_id, progress_msg)
+        with JobWorkspace(workspace_id) as workspace:
+            if is_profile:
+                # Posts are downloaded on the context while earlier ones upload, so it stays leased
+                async with self.instagram_pool.lease() as L:
+                    await self.download_instagram_profile(L, url, chat_id, progress_msg, workspace, sync, skip)
+                return False
+            
+            async with self.instagram_pool.lease() as L:
+                files = await self.fetch_instagram_post(L, shortcode, workspace)
+            
+            # Upload exactly the files this job produced, with the context free for other jobs
+            try:
+                sent_files = await self.upload_instagram_files(chat_id, progress_msg, files)
+            finally:
+                release_media(files)
+        
+        if sent_files:
+            self.file_cache.put(shortcode, 'post', '', sent_files)
+        return bool(sent_files)
     
-    async def upload_instagram_files(self, chat_id: int, progress_msg):
-        """Upload Instagram files to Telegram"""
-        files_uploaded = 0
+    async def download_instagram_profile(self, L, url: str, chat_id: int, progress_msg, workspace: JobWorkspace,
+                                         sync: bool, skip=None):
+        """Stream a profile on a leased Instaloader: posts are uploaded while later ones still download"""
+        profile_name = self.extract_instagram_username(url)
+        profile = await self.executor.run(instaloader.Profile.from_username, L.context, profile_name)
         
-        for root, dirs, files in os.walk(TEMP_DIR):
-            for file in files:
-                if file.endswith(('.jpg', '.jpeg', '.png', '.mp4')):
-                    file_path = os.path.join(root, file)
-                    files_uploaded += 1
-                    
-                    await self.app.bot.edit_message_text(
-                        f"📤 *Uploading Files...*\n\n"
-                        f"📊 Uploaded: {files_uploaded} files\n"
-                        f"🔄 Uploading: {file}",
-                        chat_id,
-                        progress_msg.message_id,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    
-                    await self.upload_file_to_telegram(file_path, chat_id, None)
-                    os.remove(file_path)
+        seen = self.profile_index.seen(profile.username, chat_id) if sync else None
+        pipeline = ProfilePipeline(
+            self, L, profile, chat_id, progress_msg, workspace, seen=seen, skip=skip,
+            on_delivered=lambda code: self.profile_index.mark(profile.username, chat_id, code)
+        )
+        files_uploaded = await pipeline.run()
         
-        await self.app.bot.edit_message_text(
-            f"✅ *Download Complete!*\n\n"
-            f"📊 Total files uploaded: {files_uploaded}\n"
-            f"🎉 All files have been sent successfully!",
+        if sync and not pipeline.found:
+            await self.progress.finish(
+                chat_id,
+                progress_msg.message_id,
+                f"✅ *Profile Up To Date*\n\n"
+                f"👤 Profile: {profile.username}\n"
+                f"📭 No new posts since your last download."
+            )
+            return
+        
+        await self.progress.finish(
             chat_id,
             progress_msg.message_id,
-            parse_mode=ParseMode.MARKDOWN
+            f"✅ *Download Complete!*\n\n"
+            f"👤 Profile: {profile.username}\n"
+            f"📊 Total files uploaded: {files_uploaded}\n"
+            f"🎉 All files have been sent successfully!"
         )
     
-    async def upload_file_to_telegram(self, file_path: str, chat_id: int, progress_msg):
-        """Upload file to Telegram"""
+    async def fetch_instagram_post(self, L, shortcode: str, workspace: JobWorkspace) -> list:
+        """Download one post on a leased Instaloader: small media stays in memory, the rest goes to disk"""
+        post = await self.executor.run(instaloader.Post.from_shortcode, L.context, shortcode)
+        files = await self.executor.run(fetch_post_media, L, post, self.memory_budget)
+        if files is None:
+            await self.executor.run(L.download_post, post, target=Path(workspace.path))
+            files = workspace.collect()
+        return files
+    
+    async def upload_instagram_files(self, chat_id: int, progress_msg, file_paths: list) -> list:
+        """Upload Instagram files (paths or in-memory media) as albums, returning their file_id entries"""
+        # Anything that cannot go into an album is sent on its own
+        albums, singles = pack_albums(file_paths)
+        
+        total_files = len(file_paths)
+        files_uploaded = 0
+        album_results = [[] for _ in albums]
+        semaphore = asyncio.Semaphore(UPLOAD_ALBUMS_IN_FLIGHT)
+        
+        async def upload_album(index: int, album: list):
+            nonlocal files_uploaded
+            async with semaphore:
+                album_results[index] = await self.send_album(chat_id, album)
+            files_uploaded += sum(1 for entry in album_results[index] if entry)
+            if progress_msg:
+                self.progress.report(
+                    chat_id,
+                    progress_msg.message_id,
+                    f"📤 *Uploading Files...*\n\n"
+                    f"📊 Uploaded: {files_uploaded}/{total_files} files\n"
+                    f"🔄 Albums sent: {sum(1 for result in album_results if result)}/{len(albums)}"
+                )
+        
+        await asyncio.gather(*(upload_album(index, album) for index, album in enumerate(albums)))
+        sent_files = [entry for result in album_results for entry in result if entry]
+        
+        for file_path in singles:
+            message = await self.upload_file_to_telegram(file_path, chat_id, None)
+            if message:
+                sent_files.append(self.file_entry(message))
+        
+        if progress_msg:
+            text = (
+                f"✅ *Download Complete!*\n\n"
+                f"📊 Total files uploaded: {len(sent_files)}\n"
+            )
+            if len(sent_files) < total_files:
+                text += f"⚠️ Failed: {total_files - len(sent_files)} files"
+            else:
+                text += "🎉 All files have been sent successfully!"
+            await self.progress.finish(chat_id, progress_msg.message_id, text)
+        return sent_files
+    
+    async def send_album(self, chat_id: int, file_paths: list) -> list:
+        """Send up to 10 photos/videos as one album, keeping their order
+
+        Returns one file_id entry per file, None for a file that was not sent.
+        """
+        if len(file_paths) == 1:
+            message = await self.upload_file_to_telegram(file_paths[0], chat_id, None)
+            return [self.file_entry(message) if message else None]
+        
+        media = []
+        for file_path in file_paths:
+            name = media_name(file_path)
+            with media_content(file_path) as content:
+                if name.lower().endswith(ALBUM_VIDEO_EXTENSIONS):
+                    media.append(InputMediaVideo(content, filename=name))
+                else:
+                    media.append(InputMediaPhoto(content, filename=name))
+        
+        try:
+            messages = await self.app.bot.send_media_group(chat_id, media)
+        except BadRequest as e:
+            # One bad item fails the whole album; fall back to single uploads
+            logger.warning(f"Album upload rejected, sending files one by one: {e}")
+            entries = []
+            for file_path in file_paths:
+                message = await self.upload_file_to_telegram(file_path, chat_id, None)
+                entries.append(self.file_entry(message) if message else None)
+            return entries
+        
+        return [self.file_entry(message) for message in messages]
+    
+    async def upload_media(self, file_path: str, chat_id: int, progress_msg, info: dict = None) -> list:
+        """Upload a downloaded file, splitting a video over the upload limit into parts
+
+        `info` is yt-dlp's info about the download, used for video metadata.
+        Returns the sent messages in order, or an empty list when the file
+        (or any of its parts) could not be sent.
+        """
+        if not (SPLIT_LARGE_VIDEOS and media_size(file_path) > MAX_FILE_SIZE
+                and file_path.lower().endswith(SPLITTABLE_EXTENSIONS)):
+            message = await self.upload_file_to_telegram(file_path, chat_id, progress_msg, info=info)
+            return [message] if message else []
+        
+        name = media_name(file_path)
+        if progress_msg:
+            self.progress.report(
+                chat_id,
+                progress_msg.message_id,
+                "✂️ *Splitting Video...*\n\n"
+                f"📁 File: {name}\n"
+                f"📊 Size: {media_size(file_path) / (1024*1024):.1f}MB "
+                f"(Max: {MAX_FILE_SIZE / (1024*1024):.0f}MB per part)"
+            )
+        try:
+            parts = await self.ffmpeg.split_video(file_path, MAX_FILE_SIZE, (info or {}).get('duration'))
+        except Exception as e:
+            await self.handle_error(e, chat_id, f"Failed to split {name}")
+            return []
+        
+        messages = []
+        for index, part in enumerate(parts, 1):
+            if progress_msg:
+                self.progress.report(
+                    chat_id,
+                    progress_msg.message_id,
+                    "📤 *Uploading to Telegram...*\n\n"
+                    f"📁 File: {name}\n" +
+                    PART_CAPTION.format(index, len(parts))
+                )
+            message = await self.upload_file_to_telegram(
+                part, chat_id, None, caption=PART_CAPTION.format(index, len(parts))
+            )
+            os.remove(part)  # frees disk for the next part
+            if message is None:
+                return []
+            messages.append(message)
+        
+        if progress_msg:
+            await self.progress.finish(
+                chat_id,
+                progress_msg.message_id,
+                "✅ *Upload Complete!*\n\n"
+                f"📁 File: {name}\n"
+                f"✂️ Sent in {len(parts)} parts"
+            )
+        return messages
+    
+    def upload_source(self, file_path):
+        """What to hand PTB for a file: its path for a local Bot API server, the bytes otherwise"""
+        if BOT_API_LOCAL_MODE and isinstance(file_path, str):
+            return contextlib.nullcontext(Path(file_path).resolve())
+        return media_content(file_path)
+    
+    async def upload_file_to_telegram(self, file_path, chat_id: int, progress_msg, caption: str = None,
+                                      info: dict = None):
+        """Upload a file (path or in-memory media) to Telegram, returning the sent message
+
+        Videos on disk are made streamable and sent with their duration,
+        size and a thumbnail, taken from yt-dlp's `info` when given.
+        """
+        name = media_name(file_path)
         try:
-            file_size = os.path.getsize(file_path)
+            file_size = media_size(file_path)
             
             if file_size > MAX_FILE_SIZE:
                 await self.app.bot.send_message(
                     chat_id,
-                    f"❌ File too large: {os.path.basename(file_path)}\n"
+                    f"❌ File too large: {name}\n"
                     f"Size: {file_size / (1024*1024):.1f}MB (Max: {MAX_FILE_SIZE / (1024*1024):.0f}MB)"
                 )
-                return
+                return None
             
             if progress_msg:
-                await self.app.bot.edit_message_text(
-                    "📤 *Uploading to Telegram...*\n\n"
-                    f"📁 File: {os.path.basename(file_path)}\n"
-                    f"📊 Size: {file_size / (1024*1024):.1f}MB\n"
-                    "🔄 Uploading...",
+                self.progress.report(
                     chat_id,
                     progress_msg.message_id,
-                    parse_mode=ParseMode.MARKDOWN
+                    "📤 *Uploading to Telegram...*\n\n"
+                    f"📁 File: {name}\n"
+                    f"📊 Size: {file_size / (1024*1024):.1f}MB\n"
+                    "🔄 Uploading..."
                 )
             
-            with open(file_path, 'rb') as file:
-                if file_path.lower().endswith(('.mp4', '.avi', '.mov')):
-                    await self.app.bot.send_video(chat_id, file)
-                elif file_path.lower().endswith(('.mp3', '.wav', '.m4a')):
-                    await self.app.bot.send_audio(chat_id, file)
+            options = {'caption': caption, 'read_timeout': UPLOAD_TIMEOUT, 'write_timeout': UPLOAD_TIMEOUT}
+            with contextlib.ExitStack() as stack:
+                if name.lower().endswith(('.mp4', '.avi', '.mov')):
+                    send = self.app.bot.send_video
+                    options['supports_streaming'] = True
+                    meta = await prepare_video(self.ffmpeg, file_path, info) if isinstance(file_path, str) else None
+                    if meta:
+                        options.update(duration=meta.duration, width=meta.width, height=meta.height)
+                        if meta.thumbnail:
+                            options['thumbnail'] = stack.enter_context(self.upload_source(meta.thumbnail))
+                elif name.lower().endswith(('.mp3', '.wav', '.m4a')):
+                    send = self.app.bot.send_audio
                 else:
-                    await self.app.bot.send_document(chat_id, file)
+                    send = self.app.bot.send_document
+                file = stack.enter_context(self.upload_source(file_path))
+                message = await send(chat_id, file, filename=name, **options)
             
             if progress_msg:
-                await self.app.bot.edit_message_text(
-                    "✅ *Upload Complete!*\n\n"
-                    f"📁 File: {os.path.basename(file_path)}\n"
-                    "🎉 Successfully uploaded to Telegram!",
+                await self.progress.finish(
                     chat_id,
                     progress_msg.message_id,
-                    parse_mode=ParseMode.MARKDOWN
+                    "✅ *Upload Complete!*\n\n"
+                    f"📁 File: {name}\n"
+                    "🎉 Successfully uploaded to Telegram!"
                 )
+            
+            return message
                 
         except Exception as e:
-            await self.handle_error(e, chat_id, f"Failed to upload {os.path.basename(file_path)}")
+            await self.handle_error(e, chat_id, f"Failed to upload {name}")
+            return None
+    
+    def file_entry(self, message) -> dict:
+        """Describe the file Telegram stored for a sent message"""
+        if message.video:
+            return {'kind': 'video', 'file_id': message.video.file_id}
+        if message.audio:
+            return {'kind': 'audio', 'file_id': message.audio.file_id}
+        if message.photo:
+            return {'kind': 'photo', 'file_id': message.photo[-1].file_id}
+        return {'kind': 'document', 'file_id': message.document.file_id}
     
-    async def youtube_progress_hook(self, d, progress_msg, chat_id):
-        """YouTube download progress hook"""
+    def media_entries(self, messages: list) -> list:
+        """file_id entries of an upload_media result, numbering the parts of a split video"""
+        entries = [self.file_entry(message) for message in messages]
+        if len(entries) > 1:
+            for index, entry in enumerate(entries, 1):
+                entry['part'] = [index, len(entries)]
+        return entries
+    
+    async def deliver_from_cache(self, chat_id: int, media_key: str, format_type: str, quality: str = "") -> bool:
+        """Re-send previously uploaded files by file_id; False on a miss"""
+        files = self.file_cache.get(media_key, format_type, quality)
+        if not files:
+            return False
+        
+        senders = {
+            'video': self.app.bot.send_video,
+            'audio': self.app.bot.send_audio,
+            'photo': self.app.bot.send_photo,
+            'document': self.app.bot.send_document,
+        }
+        try:
+            if any('part' in entry for entry in files):
+                # Parts of a split video, captioned like the first delivery
+                for entry in files:
+                    await senders[entry['kind']](chat_id, entry['file_id'], caption=PART_CAPTION.format(*entry['part']))
+            elif len(files) > 1 and all(entry['kind'] in ('photo', 'video') for entry in files):
+                for start in range(0, len(files), MEDIA_GROUP_SIZE):
+                    album = files[start:start + MEDIA_GROUP_SIZE]
+                    if len(album) == 1:
+                        await senders[album[0]['kind']](chat_id, album[0]['file_id'])
+                        continue
+                    await self.app.bot.send_media_group(chat_id, [
+                        InputMediaVideo(entry['file_id']) if entry['kind'] == 'video'
+                        else InputMediaPhoto(entry['file_id'])
+                        for entry in album
+                    ])
+            else:
+                for entry in files:
+                    await senders[entry['kind']](chat_id, entry['file_id'])
+        except BadRequest as e:
+            # Telegram no longer knows the file; fall back to a fresh download
+            logger.warning(f"Cached file_id rejected for {media_key}: {e}")
+            self.file_cache.invalidate(media_key, format_type, quality)
+            return False
+        return True
+    
+    def check_stopping(self):
+        """Abort a blocking yt-dlp download when the bot shuts down (called from progress hooks)"""
+        if self.stopping.is_set():
+            # Leave the .part file in place for the resumed job
+            raise yt_dlp.utils.DownloadCancelled("Bot is shutting down")
+    
+    def youtube_progress_hook(self, d, chat_id: int, message_id: int):
+        """YouTube download progress hook (called from worker threads)"""
+        self.check_stopping()
         try:
             if d['status'] == 'downloading':
-                percent = d.get('_percent_str', '0%')
-                speed = d.get('_speed_str', 'Unknown')
-                eta = d.get('_eta_str', 'Unknown')
+                percent = d.get('_percent_str', '0%').strip()
+                speed = d.get('_speed_str', 'Unknown').strip()
+                eta = d.get('_eta_str', 'Unknown').strip()
                 
-                await self.app.bot.edit_message_text(
+                self.progress.report(
+                    chat_id,
+                    message_id,
                     f"📥 *Downloading...*\n\n"
                     f"📊 Progress: {percent}\n"
                     f"🚀 Speed: {speed}\n"
-                    f"⏱️ ETA: {eta}",
-                    chat_id,
-                    progress_msg.message_id,
-                    parse_mode=ParseMode.MARKDOWN
+                    f"⏱️ ETA: {eta}"
                 )
         except Exception:
             pass  # Ignore progress update errors
     
-    async def get_youtube_qualities(self, url: str) -> dict:
-        """Get available YouTube qualities"""
+    def prefetch_youtube_info(self, url: str) -> asyncio.Task:
+        """Start metadata extraction in the background"""
+        task = asyncio.create_task(self.get_youtube_info(url))
+        # Failures are reported when the result is awaited
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+    
+    def cancel_prefetch(self, user_id: int):
+        """Drop a user's pending metadata prefetch"""
+        info_future = self.info_prefetch.pop(user_id, None)
+        if info_future is not None:
+            info_future.cancel()
+    
+    async def get_session_info(self, url: str, info_future=None) -> dict:
+        """Get metadata for a URL, awaiting its prefetch when there is one"""
+        if info_future is not None and not info_future.cancelled():
+            try:
+                return await asyncio.shield(info_future)
+            except asyncio.CancelledError:
+                if not info_future.cancelled():
+                    raise
+            except Exception as e:
+                # Prefetch errors are often transient; extract again for the job
+                logger.warning(f"Metadata prefetch for {url} failed, retrying: {e}")
+        return await self.get_youtube_info(url)
+    
+    async def get_youtube_info(self, url: str) -> dict:
+        """Get slimmed YouTube metadata, extracting it at most once per video"""
+        video_id = self.extract_youtube_id(url)
+        if video_id:
+            info = self.info_cache.get(video_id)
+            if info is not None:
+                return info
+        
+        # Share one extraction between concurrent requests for the same video
+        key = video_id or url
+        entry = self.info_inflight.get(key)
+        if entry is None:
+            entry = self.info_inflight[key] = [asyncio.create_task(self.fetch_youtube_info(url, video_id)), 0]
+            entry[0].add_done_callback(lambda _: self.info_inflight.pop(key, None))
+        
+        entry[1] += 1
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-                formats = info.get('formats', [])
-                
-                available_qualities = {}
-                for quality, format_selector in YOUTUBE_QUALITIES.items():
-                    available_qualities[quality] = format_selector
-                
-                return available_qualities
+            return copy.deepcopy(await asyncio.shield(entry[0]))
+        finally:
+            entry[1] -= 1
+            # Nobody is waiting for the result any more
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+    
+    async def fetch_youtube_info(self, url: str, video_id: str) -> dict:
+        """Extract YouTube metadata on the metadata pool and cache it"""
+        info = await self.metadata_executor.run(self.extract_youtube_info, url)
+        if not info:
+            raise RuntimeError(f"Could not extract info for {url}")
+        
+        # Playlists are downloaded from their URL; only keep a summary
+        if info.get('_type', 'video') != 'video':
+            return {key: info[key] for key in ('_type', 'id', 'title', 'webpage_url') if key in info}
+        # Live streams are not worth caching
+        if info.get('is_live'):
+            return slim_info(info)
+        return self.info_cache.put(info.get('id') or video_id, info)
+    
+    def open_youtube_playlist(self, url: str) -> dict:
+        """Extract a playlist with its entries left unresolved (blocking, runs on the worker pool)"""
+        ydl = yt_dlp.YoutubeDL({**YDL_BASE_OPTS, 'quiet': True, 'extract_flat': 'in_playlist', 'noplaylist': False})
+        return ydl.extract_info(url, download=False, process=False) or {}
+    
+    def extract_youtube_info(self, url: str) -> dict:
+        """Extract unprocessed YouTube metadata (blocking, runs on the metadata pool)"""
+        with yt_dlp.YoutubeDL({**YDL_BASE_OPTS, 'quiet': True}) as ydl:
+            return ydl.extract_info(url, download=False, process=False)
+    
+    async def get_youtube_qualities(self, session: Session, info_future=None) -> dict:
+        """Get the qualities actually available for the session's video"""
+        try:
+            info = await self.get_session_info(session.url, info_future)
         except Exception:
-            return {"Best": "best", "720p": "best[height<=720]", "480p": "best[height<=480]"}
+            info = {}
+        return build_quality_options(info, session.format, MAX_FILE_SIZE)
     
-    async def session_timeout(self, user_id: int, timeout: int):
-        """Handle session timeout"""
-        await asyncio.sleep(timeout)
+    async def notify_expired(self, sessions: list):
+        """Tell the users of one reaper tick's expired sessions, all at once"""
+        for session in sessions:
+            # Nobody will use the prefetched metadata any more
+            self.cancel_prefetch(session.user_id)
         
-        if user_id in user_sessions:
-            session = user_sessions[user_id]
-            if time.time() - session['timestamp'] >= timeout:
-                del user_sessions[user_id]
-                
-                try:
-                    await self.app.bot.send_message(
-                        session['chat_id'],
-                        "⏰ *Session Expired*\n\n"
-                        "You took too long to respond. Please try again with /download",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                except Exception:
-                    pass
+        async def notify(session):
+            try:
+                await self.app.bot.send_message(
+                    session.chat_id,
+                    "⏰ *Session Expired*\n\n"
+                    "You took too long to respond. Please try again with /download",
+                    parse_mode=ParseMode.MARKDOWN
+                )
+            except Exception:
+                pass
+        
+        # The rate limiter spreads the batch over the per-chat and global budgets
+        await asyncio.gather(*(notify(session) for session in sessions))
     
     async def handle_error(self, error: Exception, chat_id: int, context: str):
         """Handle errors and send to support chat"""
@@ -687,36 +1457,34 @@ Choose an option below to get started:
             logger.error(f"Failed to send error to support chat: {error}")
     
     def is_youtube_url(self, url: str) -> bool:
-        """Check if URL is a valid YouTube URL"""
-        youtube_patterns = [
-            r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+',
-            r'(?:https?://)?(?:www\.)?youtu\.be/[\w-]+',
-            r'(?:https?://)?(?:www\.)?youtube\.com/playlist\?list=[\w-]+',
-        ]
-        return any(re.match(pattern, url) for pattern in youtube_patterns)
+        """Check if URL is a YouTube video or playlist"""
+        key = classify(url)
+        return key is not None and key.platform == 'youtube'
+    
+    def is_youtube_playlist(self, url: str) -> bool:
+        """Check if a YouTube URL points at a playlist rather than a video"""
+        key = classify(url)
+        return key is not None and key.platform == 'youtube' and key.kind == 'playlist'
     
     def is_instagram_url(self, url: str) -> bool:
-        """Check if URL is a valid Instagram URL"""
-        instagram_patterns = [
-            r'(?:https?://)?(?:www\.)?instagram\.com/p/[\w-]+',
-            r'(?:https?://)?(?:www\.)?instagram\.com/reel/[\w-]+',
-            r'(?:https?://)?(?:www\.)?instagram\.com/tv/[\w-]+',
-            r'(?:https?://)?(?:www\.)?instagram\.com/[\w.-]+/?$',
-        ]
-        return any(re.match(pattern, url) for pattern in instagram_patterns)
+        """Check if URL is an Instagram post, story or profile"""
+        key = classify(url)
+        return key is not None and key.platform == 'instagram'
+    
+    def extract_youtube_id(self, url: str) -> str:
+        """Extract YouTube video ID from URL"""
+        key = classify(url)
+        return key.id if key and key.platform == 'youtube' and key.kind == 'video' else ""
+    
+    def extract_instagram_username(self, url: str) -> str:
+        """Extract Instagram username from a profile URL"""
+        key = classify(url)
+        return key.id if key and key.kind == 'profile' else ""
     
     def extract_instagram_shortcode(self, url: str) -> str:
         """Extract Instagram shortcode from URL"""
-        patterns = [
-            r'/p/([^/?]+)',
-            r'/reel/([^/?]+)',
-            r'/tv/([^/?]+)',
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return ""
+        key = classify(url)
+        return key.id if key and key.kind == 'post' else ""
     
     def format_duration(self, seconds: int) -> str:
         """Format duration in seconds to readable format"""
@@ -739,10 +1507,258 @@ Choose an option below to get started:
         except Exception:
             return "Unknown"
     
+    def submit_job(self, kind: str, chat_id: int, user_id: int, params: dict, progress_msg=None,
+                   info_future=None, status_msg=None) -> str:
+        """Persist a download job and start running it (or hand it to the workers)
+
+        `status_msg` (defaulting to `progress_msg`) shows the queue position
+        while the job waits for the scheduler.
+        """
+        status_msg = status_msg or progress_msg
+        job = self.jobs.create(kind, chat_id, user_id, params, status_msg.message_id if status_msg else None)
+        if BOT_ROLE == 'frontend':
+            asyncio.create_task(self.enqueue_job(job))
+        else:
+            self.start_job(job, progress_msg, info_future)
+        return job['id']
+    
+    async def enqueue_job(self, job: dict):
+        """Announce a stored job to the workers"""
+        try:
+            await self.job_queue.push(job)
+        except Exception as e:
+            # Still queued in the job store, where idle workers find it
+            logger.warning(f"Failed to enqueue job {job['id']}: {e}")
+    
+    def job_message(self, job: dict) -> Message:
+        """Stand-in for a job's progress message, which another process sent"""
+        return Message(job['message_id'], datetime.now(), Chat(job['chat_id'], Chat.PRIVATE))
+    
+    def start_job(self, job: dict, progress_msg=None, info_future=None):
+        """Run a stored job in the background"""
+        task = asyncio.create_task(self.run_job(job, progress_msg, info_future))
+        self.job_tasks[job['id']] = task
+        task.add_done_callback(lambda _: self.job_tasks.pop(job['id'], None))
+    
+    def estimate_job_size(self, job: dict) -> int:
+        """Expected download size in bytes, used to favour small jobs"""
+        if job['kind'] == 'youtube':
+            if job['params'].get('playlist'):
+                return YOUTUBE_VIDEO_SIZE_ESTIMATE * YOUTUBE_PLAYLIST_LIMIT
+            return job['params'].get('size')
+        if job['kind'] == 'bulk':
+            return sum(
+                YOUTUBE_VIDEO_SIZE_ESTIMATE if item['platform'] == 'youtube' else INSTAGRAM_POST_SIZE_ESTIMATE
+                for item in job['params']['items']
+            )
+        if job['kind'] == 'instagram_profile':
+            return INSTAGRAM_POST_SIZE_ESTIMATE * INSTAGRAM_PROFILE_POST_LIMIT
+        return INSTAGRAM_POST_SIZE_ESTIMATE
+    
+    def report_queue_position(self, job: dict, position: int):
+        """Show a waiting job its place in the queue"""
+        job['was_queued'] = True
+        if job['message_id']:
+            self.progress.report(
+                job['chat_id'],
+                job['message_id'],
+                "⏳ *Queued*\n\n"
+                f"📋 Position in queue: {position}\n"
+                "🔄 Your download starts as soon as a slot frees up..."
+            )
+    
+    async def run_job(self, job: dict, progress_msg=None, info_future=None):
+        """Run one job once the scheduler gives it a slot, recording its state transitions"""
+        try:
+            async with self.scheduler.slot(
+                job['user_id'], self.estimate_job_size(job),
+                on_position=lambda position: self.report_queue_position(job, position)
+            ):
+                self.jobs.start(job['id'])
+                job['attempts'] += 1
+                if job.get('was_queued') and job['message_id']:
+                    self.progress.report(
+                        job['chat_id'],
+                        job['message_id'],
+                        "🚀 *Starting Download...*\n\n"
+                        "⏳ Please wait while we process your request..."
+                    )
+                if job['kind'] == 'youtube':
+                    await self.download_youtube_video(job, progress_msg, info_future)
+                elif job['kind'] == 'bulk':
+                    await self.download_bulk_job(job, progress_msg or self.job_message(job))
+                else:
+                    await self.download_instagram_job(job, progress_msg)
+        except asyncio.CancelledError:
+            # Shutting down: the job stays 'running' and is resumed on the next start
+            raise
+        except DeliveryFailed as e:
+            self.jobs.fail(job['id'], str(e))
+        except Exception as e:
+            self.jobs.fail(job['id'], str(e))
+            message_id = self.jobs.get(job['id'])['message_id']
+            if message_id:
+                self.progress.forget(job['chat_id'], message_id)
+            await self.handle_error(e, job['chat_id'], JOB_ERROR_CONTEXTS.get(job['kind'], "Download failed"))
+        else:
+            self.jobs.finish(job['id'])
+    
+    async def abandon_job(self, job: dict):
+        """Fail a job that was interrupted too often"""
+        self.jobs.fail(job['id'], "Too many attempts")
+        try:
+            await self.app.bot.send_message(
+                job['chat_id'],
+                "❌ *Download Failed*\n\n"
+                "Your download was interrupted too many times. Please try again with /download",
+                parse_mode=ParseMode.MARKDOWN
+            )
+        except Exception:
+            pass
+    
+    async def resume_jobs(self, jobs: list):
+        """Restart jobs interrupted by the previous shutdown"""
+        for job in jobs:
+            if job['attempts'] >= JOB_MAX_ATTEMPTS:
+                await self.abandon_job(job)
+                continue
+            
+            logger.info(f"Resuming {job['kind']} job {job['id']}")
+            try:
+                progress_msg = await self.app.bot.send_message(
+                    job['chat_id'],
+                    "🔄 *Resuming Download...*\n\n"
+                    "The bot was restarted while your download was running.\n"
+                    "⏳ Picking up where it left off...",
+                    parse_mode=ParseMode.MARKDOWN
+                )
+            except Exception as e:
+                self.jobs.fail(job['id'], str(e))
+                continue
+            job['message_id'] = progress_msg.message_id
+            self.jobs.set_message(job['id'], progress_msg.message_id)
+            self.start_job(job, progress_msg)
+    
+    async def work(self):
+        """Worker role: claim queued jobs whenever a job slot is free"""
+        while not self.stopping.is_set():
+            if len(self.job_tasks) >= SCHEDULER_MAX_JOBS:
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                continue
+            try:
+                job = await self.job_queue.pop(timeout=5)
+            except Exception as e:
+                logger.warning(f"Job queue unavailable: {e}")
+                await asyncio.sleep(5)
+                continue
+            if job is None:
+                continue
+            if job['attempts'] >= JOB_MAX_ATTEMPTS:
+                await self.abandon_job(job)
+                continue
+            logger.info(f"Worker {WORKER_ID} claimed {job['kind']} job {job['id']}")
+            self.start_job(job, self.job_message(job) if job['message_id'] else None)
+    
+    async def renew_leases(self):
+        """Worker role: keep our running jobs leased and requeue jobs of workers that died"""
+        while not self.stopping.is_set():
+            try:
+                self.jobs.heartbeat(WORKER_ID, list(self.job_tasks))
+                for job in self.jobs.requeue_expired():
+                    logger.warning(f"Lease on job {job['id']} expired (worker {job['owner']}), requeueing")
+                    await self.enqueue_job(job)
+            except Exception as e:
+                logger.warning(f"Failed to renew job leases: {e}")
+            await asyncio.sleep(JOB_LEASE / 4)
+    
+    async def serve_worker(self):
+        """Run the worker role until SIGINT/SIGTERM, with the same lifecycle as the runners"""
+        application = self.app
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+        
+        await application.initialize()
+        try:
+            await self.post_init(application)
+            tasks = [asyncio.create_task(self.work()), asyncio.create_task(self.renew_leases())]
+            await stop.wait()
+            self.stopping.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            logger.info(f"Stopping worker {WORKER_ID}")
+            await self.post_stop(application)
+            await application.shutdown()
+            await self.post_shutdown(application)
+    
+    async def post_init(self, application: Application):
+        """Bind loop-owned components once the application is running"""
+        self.progress.start(asyncio.get_running_loop())
+        self.file_cache.evict()
+        if BOT_ROLE != 'worker':
+            await self.sessions.store.prune()
+            self.sessions.start()
+        if BOT_ROLE == 'frontend':
+            return  # jobs run in the worker processes
+        self.jobs.prune()
+        unfinished = self.jobs.unfinished()
+        # Partial downloads of unfinished jobs are resumed, everything else is stale
+        JobWorkspace.sweep(keep=[job['id'] for job in unfinished])
+        await self.executor.run(self.instagram_pool.load_sessions)
+        if BOT_ROLE == 'worker':
+            # Other workers' jobs may still be running; only take back our own.
+            # Jobs of workers that never come back are requeued once their lease expires.
+            unfinished = self.jobs.owned(WORKER_ID)
+            self.jobs.heartbeat(WORKER_ID, [job['id'] for job in unfinished])
+        if unfinished:
+            asyncio.create_task(self.resume_jobs(unfinished))
+    
+    async def post_stop(self, application: Application):
+        """Interrupt running jobs while the bot can still talk to Telegram
+
+        Runs before the HTTP client is shut down, so a job cut off mid-upload
+        is cancelled (and resumed later) instead of failing its upload and
+        being recorded as done.
+        """
+        self.stopping.set()
+        await self.sessions.stop()
+        tasks = dict(self.job_tasks)
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        if BOT_ROLE == 'worker':
+            # Let another worker pick them up from where this one stopped
+            for job_id in tasks:
+                job = self.jobs.get(job_id)
+                if job and job['state'] == 'running':
+                    self.jobs.requeue(job_id)
+                    await self.enqueue_job(job)
+    
+    async def post_shutdown(self, application: Application):
+        """Release worker resources once the application has shut down"""
+        await self.job_queue.close()
+        self.instagram_pool.close()
+        self.executor.shutdown()
+        self.metadata_executor.shutdown()
+        self.db.close()
+    
     def run(self):
         """Run the bot"""
-        logger.info(f"Starting {BOT_NAME}...")
-        self.app.run_polling()
+        if BOT_ROLE == 'worker':
+            logger.info(f"Starting {BOT_NAME} worker {WORKER_ID}...")
+            asyncio.run(self.serve_worker())
+            return
+        logger.info(f"Starting {BOT_NAME} in {BOT_MODE} mode ({BOT_ROLE} role)...")
+        if BOT_MODE == 'webhook':
+            asyncio.run(webhook.serve(self))
+        else:
+            self.app.run_polling()
 
 if __name__ == "__main__":
     bot = MediaDownloaderBot()
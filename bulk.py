@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+from config import BULK_WORKERS
+from progress import ParallelProgress
+
+logger = logging.getLogger(__name__)
+
+
+class BatchPipeline(ParallelProgress):
+    """Run the links of a bulk job on a bounded set of workers behind one progress message
+
+    Each link is sent as soon as it is downloaded. Links in `skip` (already
+    sent before a restart) are passed over, and `on_delivered` is called with
+    the URL of every link that was sent.
+    """
+
+    def __init__(self, bot, items: list, chat_id: int, progress_msg, workspace, format_type: str,
+                 ydl_format: str, workers: int = BULK_WORKERS, skip=None, on_delivered=None):
+        self.bot = bot
+        self.items = [item for item in items if item['url'] not in (skip or ())]
+        self.total = len(items)
+        self.chat_id = chat_id
+        self.progress_msg = progress_msg
+        self.workspace = workspace
+        self.format_type = format_type
+        self.ydl_format = ydl_format
+        self.workers = workers
+        self.on_delivered = on_delivered
+        self.init_progress()
+        self.sent = self.total - len(self.items)
+        self.failed = 0
+
+    async def run(self) -> int:
+        """Run every link to completion, returning the number sent (including earlier runs)"""
+        queue = asyncio.Queue()
+        for index, item in enumerate(self.items):
+            queue.put_nowait((index, item))
+        self.report()
+        await asyncio.gather(*(self.worker(queue) for _ in range(min(self.workers, len(self.items)))))
+        return self.sent
+
+    async def worker(self, queue: asyncio.Queue):
+        while not queue.empty():
+            index, item = queue.get_nowait()
+            try:
+                if item['platform'] == 'youtube':
+                    delivered = await self.bot.send_youtube_video(
+                        self.workspace, self.workspace.subdir(f"{index:04d}"), item['url'], self.chat_id,
+                        self.format_type, self.ydl_format, lambda d: self.hook(index, d)
+                    )
+                else:
+                    delivered = await self.bot.download_instagram_content(
+                        item['url'], self.chat_id, None, False,
+                        workspace_id=f"{self.workspace.job_id}/{index:04d}"
+                    )
+            except Exception as e:
+                logger.warning(f"Bulk item {item['url']} failed: {e}")
+                delivered = False
+            finally:
+                self.item_done(index)
+            if delivered:
+                self.sent += 1
+                if self.on_delivered:
+                    self.on_delivered(item['url'])
+            else:
+                self.failed += 1
+            self.report()
+
+    def summary(self) -> str:
+        return (
+            f"📦 *Bulk Download*\n\n"
+            f"🔗 Links: {self.total}\n"
+            f"📊 Done: {self.sent + self.failed}/{self.total}\n"
+            f"📤 Sent: {self.sent}"
+        )
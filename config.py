@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,6 +8,31 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 SUPPORT_CHAT = os.getenv('SUPPORT_CHAT', 'YOUR_SUPPORT_CHAT_ID_HERE')
 
+# Update Delivery
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # 'polling' or 'webhook'
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))  # updates handled at once
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # derived from BOT_TOKEN when empty
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Telegram Bot API
+BOT_API_URL = os.getenv('BOT_API_URL', '')  # self-hosted Bot API server, e.g. http://localhost:8081/bot
+BOT_API_FILE_URL = os.getenv('BOT_API_FILE_URL', '')  # its file endpoint, e.g. http://localhost:8081/file/bot
+# The server runs with --local and sees our files, so uploads pass a path instead of the bytes
+BOT_API_LOCAL_MODE = os.getenv('BOT_API_LOCAL_MODE', 'true' if BOT_API_URL else 'false').lower() == 'true'
+UPLOAD_TIMEOUT = float(os.getenv('UPLOAD_TIMEOUT', '600'))  # seconds one file upload may take
+
+# Process Roles
+BOT_ROLE = os.getenv('BOT_ROLE', 'all')  # 'all', 'frontend' (handles updates) or 'worker' (runs jobs)
+WORKER_ID = os.getenv('WORKER_ID', socket.gethostname())  # stable per worker so it can reclaim its jobs
+QUEUE_BACKEND = os.getenv('QUEUE_BACKEND', 'sqlite')  # 'sqlite' or 'redis'
+QUEUE_POLL_INTERVAL = float(os.getenv('QUEUE_POLL_INTERVAL', '0.5'))  # seconds between SQLite queue polls
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')  # 'memory', 'sqlite' or 'redis'
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
 # Bot Information
 BOT_NAME = "Media Downloader Bot"
 BOT_OWNER = "Your Name"
@@ -15,8 +41,30 @@ HOSTED_AT = "Sevalla Platform"
 
 # Download Settings
 DOWNLOAD_TIMEOUT = 30  # seconds to wait for user response
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB max file size
+# Upload limit: 50MB on the public Bot API, 2000MB on a local Bot API server
+MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str((2000 if BOT_API_URL else 50) * 1024 * 1024)))
+SPLIT_LARGE_VIDEOS = os.getenv('SPLIT_LARGE_VIDEOS', 'true').lower() == 'true'  # send oversize videos in parts
+VIDEO_FASTSTART = os.getenv('VIDEO_FASTSTART', 'true').lower() == 'true'  # move the MP4 index to the front
+VIDEO_THUMBNAILS = os.getenv('VIDEO_THUMBNAILS', 'true').lower() == 'true'  # send a thumbnail with each video
+# Largest video download accepted; anything above MAX_FILE_SIZE is split losslessly
+MAX_DOWNLOAD_SIZE = int(os.getenv(
+    'MAX_DOWNLOAD_SIZE', str(max(MAX_FILE_SIZE, 500 * 1024 * 1024) if SPLIT_LARGE_VIDEOS else MAX_FILE_SIZE)
+))
 TEMP_DIR = "downloads"
+UPLOAD_ALBUMS_IN_FLIGHT = int(os.getenv('UPLOAD_ALBUMS_IN_FLIGHT', '2'))  # concurrent media-group uploads
+PROGRESS_UPDATE_INTERVAL = float(os.getenv('PROGRESS_UPDATE_INTERVAL', '3'))  # min seconds between progress edits
+MEMORY_MEDIA_THRESHOLD = int(os.getenv('MEMORY_MEDIA_THRESHOLD', str(8 * 1024 * 1024)))  # smaller media skips the disk
+MEMORY_MEDIA_BUDGET = int(os.getenv('MEMORY_MEDIA_BUDGET', str(128 * 1024 * 1024)))  # total bytes held in memory
+FFMPEG_PROCESSES = int(os.getenv('FFMPEG_PROCESSES', str(os.cpu_count() or 1)))  # concurrent ffmpeg processes
+DOWNLOAD_ENGINE = os.getenv('DOWNLOAD_ENGINE', 'native')  # 'segmented' fetches byte ranges in parallel
+DOWNLOAD_SEGMENTS = int(os.getenv('DOWNLOAD_SEGMENTS', '4'))  # parallel ranges per file in segmented mode
+DOWNLOAD_SEGMENT_MIN_SIZE = int(os.getenv('DOWNLOAD_SEGMENT_MIN_SIZE', str(4 * 1024 * 1024)))  # smaller files use one stream
+DOWNLOAD_RATE_LIMIT = int(os.getenv('DOWNLOAD_RATE_LIMIT', '0'))  # bytes per second per job, 0 for unlimited
+
+# Scheduler Settings
+SCHEDULER_MAX_JOBS = int(os.getenv('SCHEDULER_MAX_JOBS', '6'))  # download jobs running at once
+SCHEDULER_PER_USER_JOBS = int(os.getenv('SCHEDULER_PER_USER_JOBS', '2'))  # jobs one user can have running
+SCHEDULER_SMALL_JOB_SIZE = int(os.getenv('SCHEDULER_SMALL_JOB_SIZE', str(20 * 1024 * 1024)))  # bytes, for latency stats
 
 # YouTube Quality Options
 YOUTUBE_QUALITIES = {
@@ -28,7 +76,46 @@ YOUTUBE_QUALITIES = {
     "1080p": "best[height<=1080]",
     "Best": "best"
 }
+YOUTUBE_PLAYLIST_LIMIT = int(os.getenv('YOUTUBE_PLAYLIST_LIMIT', '50'))  # max videos fetched per playlist
+YOUTUBE_PLAYLIST_WORKERS = int(os.getenv('YOUTUBE_PLAYLIST_WORKERS', '3'))  # playlist videos downloaded in parallel
+BULK_MAX_URLS = int(os.getenv('BULK_MAX_URLS', '50'))  # links accepted from one message or .txt file
+BULK_WORKERS = int(os.getenv('BULK_WORKERS', '3'))  # links of a bulk job downloaded in parallel
+BULK_FILE_MAX_BYTES = int(os.getenv('BULK_FILE_MAX_BYTES', str(64 * 1024)))  # largest .txt link list read
+
+# Telegram Rate Limits (outbound Bot API calls)
+RATE_LIMIT_GLOBAL = float(os.getenv('RATE_LIMIT_GLOBAL', '30'))  # requests per second, all chats
+RATE_LIMIT_PER_CHAT = float(os.getenv('RATE_LIMIT_PER_CHAT', '1'))  # requests per second, private chats
+RATE_LIMIT_CHAT_BURST = float(os.getenv('RATE_LIMIT_CHAT_BURST', '3'))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv('RATE_LIMIT_GROUP_PER_MINUTE', '20'))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))  # RetryAfter retries per request
+
+# Metadata Cache Settings
+INFO_CACHE_TTL = int(os.getenv('INFO_CACHE_TTL', '1800'))  # seconds; stream URLs expire after a few hours
+INFO_CACHE_MAX_ENTRIES = int(os.getenv('INFO_CACHE_MAX_ENTRIES', '256'))
+INFO_CACHE_MAX_BYTES = int(os.getenv('INFO_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Storage Settings
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/bot.db')  # SQLite database for persistent state
+FILE_ID_CACHE_TTL = int(os.getenv('FILE_ID_CACHE_TTL', str(30 * 24 * 3600)))  # seconds before re-uploading
+FILE_ID_CACHE_MAX_ENTRIES = int(os.getenv('FILE_ID_CACHE_MAX_ENTRIES', '100000'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))  # runs (including restarts) before a job is failed
+JOB_RETENTION = int(os.getenv('JOB_RETENTION', str(7 * 24 * 3600)))  # seconds finished jobs are kept
+JOB_LEASE = int(os.getenv('JOB_LEASE', '120'))  # seconds without a worker heartbeat before a running job is requeued
 
 # Instagram Settings
-INSTAGRAM_SESSION_FILE = "instagram_session"
+INSTAGRAM_SESSION_FILE = os.getenv('INSTAGRAM_SESSION_FILE', 'data/instagram_session')  # saved login cookies
+INSTAGRAM_USERNAME = os.getenv('INSTAGRAM_USERNAME')  # account the session file belongs to
+INSTAGRAM_CONTEXT_POOL = int(os.getenv('INSTAGRAM_CONTEXT_POOL', '2'))  # long-lived Instaloader contexts
+INSTAGRAM_BACKOFF_BASE = int(os.getenv('INSTAGRAM_BACKOFF_BASE', '60'))  # seconds a context rests after a 429
+INSTAGRAM_BACKOFF_MAX = int(os.getenv('INSTAGRAM_BACKOFF_MAX', '900'))
+INSTAGRAM_PROFILE_POST_LIMIT = int(os.getenv('INSTAGRAM_PROFILE_POST_LIMIT', '50'))  # limit to prevent spam
+INSTAGRAM_DOWNLOAD_WORKERS = int(os.getenv('INSTAGRAM_DOWNLOAD_WORKERS', '3'))  # posts downloaded in parallel
+INSTAGRAM_PIPELINE_QUEUE = int(os.getenv('INSTAGRAM_PIPELINE_QUEUE', '10'))  # max posts on disk per profile job
+
+# Thread Pools
+# A running job keeps up to its fan-out plus one listing thread busy, so every job the
+# scheduler admits gets its threads without queueing behind another job's
+JOB_FAN_OUT = max(YOUTUBE_PLAYLIST_WORKERS, BULK_WORKERS, INSTAGRAM_DOWNLOAD_WORKERS) + 1
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', str(SCHEDULER_MAX_JOBS * JOB_FAN_OUT)))  # blocking download calls
+METADATA_WORKERS = int(os.getenv('METADATA_WORKERS', '2'))  # quality menu extraction, apart from downloads
 
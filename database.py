@@ -0,0 +1,16 @@
+import os
+import sqlite3
+
+from config import DATABASE_PATH
+
+
+def connect(path: str = DATABASE_PATH) -> sqlite3.Connection:
+    """Open the bot's SQLite database with WAL journaling"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from config import DOWNLOAD_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_SENTINEL = object()
+
+
+class DownloadExecutor:
+    """Bounded worker pool for blocking extractor, downloader and ffmpeg calls"""
+
+    def __init__(self, max_workers: int = DOWNLOAD_WORKERS, name: str = "download"):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a free worker"""
+        return self._queued
+
+    @property
+    def active(self) -> int:
+        """Number of jobs currently running on a worker"""
+        return self._active
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the pool and await its result"""
+        with self._lock:
+            self._queued += 1
+
+        future = self._pool.submit(self._call, partial(func, *args, **kwargs))
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    async def iterate(self, func, *args, **kwargs):
+        """Iterate a blocking iterable factory, fetching each item on the pool"""
+        iterator = await self.run(lambda: iter(func(*args, **kwargs)))
+        while True:
+            item = await self.run(next, iterator, _SENTINEL)
+            if item is _SENTINEL:
+                return
+            yield item
+
+    def _call(self, func):
+        """Execute a job on a worker thread and keep the counters in sync"""
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            result = func()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _on_done(self, future):
+        """Release the queue slot of jobs cancelled before they started"""
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def stats(self) -> dict:
+        """Return a snapshot of the pool metrics"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queued': self._queued,
+                'active': self._active,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def shutdown(self):
+        """Stop accepting jobs and drop the ones still queued"""
+        logger.info(f"Shutting down {self.name} executor")
+        self._pool.shutdown(wait=False, cancel_futures=True)
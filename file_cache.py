@@ -0,0 +1,103 @@
+import json
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from config import FILE_ID_CACHE_TTL, FILE_ID_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+EVICT_EVERY = 100  # puts between eviction sweeps
+
+
+class FileIdCache:
+    """Persistent map of (media key, format, quality) to Telegram file_ids"""
+
+    def __init__(self, conn, ttl: int = FILE_ID_CACHE_TTL, max_entries: int = FILE_ID_CACHE_MAX_ENTRIES):
+        self.conn = conn
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_ids ("
+                " media_key TEXT NOT NULL,"
+                " format TEXT NOT NULL,"
+                " quality TEXT NOT NULL,"
+                " files TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (media_key, format, quality))"
+            )
+
+    def get(self, media_key: str, format_type: str, quality: str = "") -> Optional[List[dict]]:
+        """Return the cached files ([{'kind', 'file_id'}, ...]) or None"""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT files, created_at FROM file_ids WHERE media_key = ? AND format = ? AND quality = ?",
+                (media_key, format_type, quality)
+            ).fetchone()
+            if row is None or row['created_at'] < now - self.ttl:
+                if row is not None:
+                    self._delete(media_key, format_type, quality)
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE file_ids SET last_used = ?, hits = hits + 1"
+                " WHERE media_key = ? AND format = ? AND quality = ?",
+                (now, media_key, format_type, quality)
+            )
+            self.hits += 1
+            return json.loads(row['files'])
+
+    def put(self, media_key: str, format_type: str, quality: str, files: List[dict]):
+        """Remember the file_ids Telegram assigned to an upload"""
+        if not files:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO file_ids (media_key, format, quality, files, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (media_key, format_type, quality, json.dumps(files), now, now)
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def invalidate(self, media_key: str, format_type: str, quality: str = ""):
+        """Forget a stale entry (e.g. Telegram rejected the file_id)"""
+        logger.info(f"Invalidating cached file_id for {media_key} ({format_type} {quality})")
+        with self._lock:
+            self._delete(media_key, format_type, quality)
+
+    def evict(self):
+        """Drop expired entries and trim the table to its size bound"""
+        with self._lock:
+            self._evict(time.time())
+
+    def _delete(self, media_key: str, format_type: str, quality: str):
+        self.conn.execute(
+            "DELETE FROM file_ids WHERE media_key = ? AND format = ? AND quality = ?",
+            (media_key, format_type, quality)
+        )
+
+    def _evict(self, now: float):
+        self.conn.execute("DELETE FROM file_ids WHERE created_at < ?", (now - self.ttl,))
+        self.conn.execute(
+            "DELETE FROM file_ids WHERE rowid IN ("
+            " SELECT rowid FROM file_ids ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache metrics"""
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM file_ids").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import YOUTUBE_QUALITIES
+
+AUTO_QUALITY = "auto"
+
+
+def estimate_size(fmt: dict, duration: Optional[float]) -> Optional[int]:
+    """Estimate a format's size in bytes from yt-dlp metadata"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    tbr = fmt.get('tbr')
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+
+def _sum_sizes(*sizes) -> Optional[int]:
+    """Add size estimates, returning None when any part is unknown"""
+    if any(size is None for size in sizes):
+        return None
+    return sum(sizes)
+
+
+def _has_video(fmt: dict) -> bool:
+    return fmt.get('vcodec') not in (None, 'none') and bool(fmt.get('height'))
+
+
+def _has_audio(fmt: dict) -> bool:
+    return fmt.get('acodec') not in (None, 'none')
+
+
+def _video_rank(fmt: dict):
+    """Prefer H.264 in MP4 (plays everywhere in Telegram), then bitrate"""
+    vcodec = fmt.get('vcodec') or ''
+    return (vcodec.startswith(('avc1', 'h264')), fmt.get('ext') == 'mp4', fmt.get('tbr') or 0)
+
+
+def _audio_rank(fmt: dict):
+    """Prefer AAC/M4A audio (muxes into MP4 without re-encoding), then bitrate"""
+    return (fmt.get('ext') == 'm4a', fmt.get('abr') or fmt.get('tbr') or 0)
+
+
+def _video_options(formats: List[dict], duration) -> Dict[str, dict]:
+    """Best selector per available height, highest first"""
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    best_audio = max(audio_only, key=_audio_rank) if audio_only else None
+
+    by_height: Dict[int, dict] = {}
+    for fmt in formats:
+        if not _has_video(fmt):
+            continue
+        size = estimate_size(fmt, duration)
+        if _has_audio(fmt):
+            candidate = {'format': fmt['format_id'], 'size': size, 'rank': _video_rank(fmt)}
+        elif best_audio is not None:
+            candidate = {
+                'format': f"{fmt['format_id']}+{best_audio['format_id']}",
+                'size': _sum_sizes(size, estimate_size(best_audio, duration)),
+                'rank': _video_rank(fmt),
+            }
+        else:
+            continue
+        current = by_height.get(fmt['height'])
+        if current is None or candidate['rank'] > current['rank']:
+            by_height[fmt['height']] = candidate
+
+    options = OrderedDict()
+    for height in sorted(by_height, reverse=True):
+        option = by_height[height]
+        options[f"{height}p"] = {'format': option['format'], 'size': option['size']}
+    return options
+
+
+def _audio_options(formats: List[dict], duration) -> Dict[str, dict]:
+    """Best audio-only selector per bitrate, highest first"""
+    by_bitrate: Dict[int, dict] = {}
+    for fmt in formats:
+        if not _has_audio(fmt) or _has_video(fmt):
+            continue
+        bitrate = int(round(fmt.get('abr') or fmt.get('tbr') or 0))
+        if not bitrate:
+            continue
+        current = by_bitrate.get(bitrate)
+        if current is None or _audio_rank(fmt) > _audio_rank(current):
+            by_bitrate[bitrate] = fmt
+
+    options = OrderedDict()
+    for bitrate in sorted(by_bitrate, reverse=True):
+        fmt = by_bitrate[bitrate]
+        options[f"{bitrate}kbps"] = {'format': fmt['format_id'], 'size': estimate_size(fmt, duration)}
+    return options
+
+
+def build_quality_options(info: dict, format_type: str, max_size: int) -> Dict[str, dict]:
+    """Build the quality menu for a video from the formats it actually has
+
+    Returns an ordered mapping of label -> {'format': yt-dlp selector,
+    'size': estimated bytes or None}. When any option fits under max_size,
+    an AUTO_QUALITY entry pointing at the best one is placed first.
+    """
+    formats = info.get('formats') or []
+    duration = info.get('duration')
+
+    if format_type == 'audio':
+        options = _audio_options(formats, duration)
+        if not options:
+            options = OrderedDict([("Best", {'format': 'bestaudio/best', 'size': None})])
+    else:
+        options = _video_options(formats, duration)
+        if not options:
+            # No format list (e.g. playlists): fall back to generic selectors
+            options = OrderedDict(
+                (quality, {'format': selector, 'size': None})
+                for quality, selector in reversed(list(YOUTUBE_QUALITIES.items()))
+            )
+
+    fitting = next(
+        (option for option in options.values() if option['size'] and option['size'] <= max_size),
+        None
+    )
+    if fitting is not None:
+        options = OrderedDict([(AUTO_QUALITY, dict(fitting))] + list(options.items()))
+    return options
+
+
+def format_size(size: Optional[int]) -> str:
+    """Human readable size estimate"""
+    if not size:
+        return "size unknown"
+    return f"~{size / (1024 * 1024):.1f}MB"
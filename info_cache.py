@@ -0,0 +1,98 @@
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import INFO_CACHE_TTL, INFO_CACHE_MAX_ENTRIES, INFO_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Top-level fields needed to describe a video and re-run format selection
+INFO_KEYS = (
+    '_type', 'id', 'title', 'fulltitle', 'duration', 'uploader', 'channel', 'thumbnail',
+    'webpage_url', 'original_url', 'webpage_url_basename', 'webpage_url_domain',
+    'extractor', 'extractor_key', 'formats', 'http_headers', 'is_live', 'live_status',
+    'was_live', 'upload_date', 'timestamp', 'age_limit', 'availability', '_format_sort_fields',
+    'url', 'ext', 'protocol', 'format_id', 'width', 'height', 'filesize', 'filesize_approx',
+)
+
+# Per-format fields needed to size, select and download a format
+FORMAT_KEYS = (
+    'format_id', 'format_note', 'format', 'ext', 'protocol', 'url', 'manifest_url',
+    'fragment_base_url', 'fragments', 'width', 'height', 'fps', 'resolution', 'aspect_ratio',
+    'vcodec', 'acodec', 'abr', 'vbr', 'tbr', 'asr', 'audio_channels', 'audio_ext', 'video_ext',
+    'filesize', 'filesize_approx', 'quality', 'source_preference', 'preference', 'language',
+    'language_preference', 'has_drm', 'dynamic_range', 'container', 'http_headers',
+    'downloader_options', 'is_from_start', '__sort_fields',
+)
+
+
+def slim_info(info: dict) -> dict:
+    """Reduce a yt-dlp info dict to the fields the bot actually uses"""
+    slim = {key: info[key] for key in INFO_KEYS if key in info}
+    if 'formats' in slim:
+        slim['formats'] = [
+            {key: fmt[key] for key in FORMAT_KEYS if key in fmt}
+            for fmt in slim['formats'] or []
+            # Storyboards and other image-only formats are never downloaded
+            if not (fmt.get('vcodec') == 'none' and fmt.get('acodec') == 'none')
+        ]
+    return slim
+
+
+class InfoCache:
+    """TTL + LRU cache of slimmed yt-dlp info dicts keyed by video ID"""
+
+    def __init__(self, ttl: int = INFO_CACHE_TTL, max_entries: int = INFO_CACHE_MAX_ENTRIES,
+                 max_bytes: int = INFO_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, size, info)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return a private copy of a cached info dict, or None"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # yt-dlp mutates info dicts while processing them
+        return copy.deepcopy(entry[2])
+
+    def put(self, key: str, info: dict) -> dict:
+        """Slim and store an info dict, returning the stored view"""
+        slim = slim_info(info)
+        size = len(json.dumps(slim, default=str))
+        if size > self.max_bytes:
+            logger.debug(f"Info for {key} too large to cache ({size} bytes)")
+            return slim
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, slim)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        return copy.deepcopy(slim)
+
+    def _remove(self, key: str):
+        """Drop an entry and release its memory budget"""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        """Return a snapshot of the cache metrics"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from albums import MEDIA_GROUP_SIZE, fits_album
+from config import (
+    UPLOAD_ALBUMS_IN_FLIGHT, INSTAGRAM_PROFILE_POST_LIMIT, INSTAGRAM_DOWNLOAD_WORKERS, INSTAGRAM_PIPELINE_QUEUE
+)
+from memory_media import fetch_post_media, release_media
+
+logger = logging.getLogger(__name__)
+
+ALBUM_LINGER = 3.0  # seconds to wait for more files before sending a partial album
+PINNED_POSTS_MAX = 3  # pinned posts come first in the feed regardless of their date
+
+
+class ProfilePipeline:
+    """Stream an Instagram profile: enumerate posts -> download workers -> album uploader
+
+    At most `queue_size` posts are on disk at any time; a post's directory is
+    removed as soon as all of its files have been delivered.
+
+    When `seen` is given (sync mode) enumeration stops at the first post that
+    was already delivered, so only new posts are downloaded. Posts in `skip`
+    (already sent before a restart) are passed over without stopping.
+    `on_delivered` is called with the shortcode of every post whose files
+    were all sent.
+    """
+
+    def __init__(self, bot, loader, profile, chat_id: int, progress_msg, workspace,
+                 limit: int = INSTAGRAM_PROFILE_POST_LIMIT, workers: int = INSTAGRAM_DOWNLOAD_WORKERS,
+                 queue_size: int = INSTAGRAM_PIPELINE_QUEUE, seen=None, skip=None, on_delivered=None):
+        self.bot = bot
+        self.loader = loader
+        self.profile = profile
+        self.chat_id = chat_id
+        self.progress_msg = progress_msg
+        self.workspace = workspace
+        self.limit = limit
+        self.workers = workers
+        self.seen = seen
+        self.skip = skip or set()
+        self.on_delivered = on_delivered
+        self.posts = asyncio.Queue(maxsize=queue_size)
+        self.ready = asyncio.Queue()
+        self.disk_slots = asyncio.Semaphore(queue_size)
+        self.album_slots = asyncio.Semaphore(UPLOAD_ALBUMS_IN_FLIGHT)
+        self.remaining = {}  # post dir -> files not yet delivered
+        self.incomplete = set()  # post dirs with at least one failed upload
+        self.found = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.uploaded = 0
+
+    async def run(self) -> int:
+        """Run the pipeline to completion, returning the number of files uploaded"""
+        tasks = [asyncio.create_task(self.enumerate_posts())]
+        tasks += [asyncio.create_task(self.download_worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self.upload_files()))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return self.uploaded
+
+    async def enumerate_posts(self):
+        """Producer: feed posts into the bounded queue"""
+        try:
+            position = 0
+            async for post in self.bot.executor.iterate(self.profile.get_posts):
+                position += 1
+                if self.seen is not None and post.shortcode in self.seen:
+                    if position <= PINNED_POSTS_MAX:
+                        continue  # possibly a pinned post above newer ones
+                    break
+                if post.shortcode in self.skip:
+                    continue
+                self.found += 1
+                await self.posts.put(post)
+                if self.found >= self.limit:
+                    break
+        finally:
+            for _ in range(self.workers):
+                await self.posts.put(None)
+
+    async def download_worker(self):
+        """Download posts into their own directories until the producer is done"""
+        try:
+            while True:
+                post = await self.posts.get()
+                if post is None:
+                    return
+                await self.disk_slots.acquire()
+                post_dir = os.path.join(self.workspace.path, post.shortcode)
+                try:
+                    # Small posts are kept in memory; the directory is only created on fallback
+                    files = await self.bot.executor.run(fetch_post_media, self.loader, post, self.bot.memory_budget)
+                    if files is None:
+                        self.workspace.subdir(post.shortcode)
+                        await self.bot.executor.run(self.loader.download_post, post, target=Path(post_dir))
+                        files = self.workspace.collect(post_dir)
+                except Exception as e:
+                    logger.warning(f"Failed to download post {post.shortcode}: {e}")
+                    self.failed += 1
+                    files = []
+                if not files:
+                    self.release(post_dir)
+                    continue
+                self.downloaded += 1
+                self.remaining[post_dir] = len(files)
+                await self.ready.put((post_dir, files))
+                self.report()
+        finally:
+            await self.ready.put(None)
+
+    async def upload_files(self):
+        """Consumer: batch downloaded files into albums as soon as they are ready"""
+        pending = []
+        running = set()
+        workers_left = self.workers
+        while workers_left:
+            try:
+                timeout = ALBUM_LINGER if pending else None
+                item = await asyncio.wait_for(self.ready.get(), timeout)
+            except asyncio.TimeoutError:
+                item = False
+            if item is None:
+                workers_left -= 1
+            elif item:
+                post_dir, files = item
+                for file_path in files:
+                    if fits_album(file_path):
+                        pending.append((post_dir, file_path))
+                    else:
+                        running.add(asyncio.create_task(self.send_batch([(post_dir, file_path)])))
+            while len(pending) >= MEDIA_GROUP_SIZE:
+                running.add(asyncio.create_task(self.send_batch(pending[:MEDIA_GROUP_SIZE])))
+                del pending[:MEDIA_GROUP_SIZE]
+            if pending and item is False:
+                running.add(asyncio.create_task(self.send_batch(pending)))
+                pending = []
+            running = {task for task in running if not task.done()}
+        if pending:
+            running.add(asyncio.create_task(self.send_batch(pending)))
+        if running:
+            await asyncio.gather(*running)
+
+    async def send_batch(self, batch: list):
+        """Send one album (or a single file) and free fully delivered posts"""
+        try:
+            async with self.album_slots:
+                entries = await self.bot.send_album(self.chat_id, [file_path for _, file_path in batch])
+        except Exception as e:
+            # Keep streaming the rest of the profile
+            logger.warning(f"Failed to upload album for {self.profile.username}: {e}")
+            entries = []
+        # Files without an entry never reached Telegram; their posts aren't delivered
+        for index, (post_dir, _) in enumerate(batch):
+            if index < len(entries) and entries[index]:
+                self.uploaded += 1
+            else:
+                self.incomplete.add(post_dir)
+        release_media([file_path for _, file_path in batch])
+        for post_dir, _ in batch:
+            self.remaining[post_dir] -= 1
+            if self.remaining[post_dir] == 0:
+                del self.remaining[post_dir]
+                if post_dir in self.incomplete:
+                    self.incomplete.discard(post_dir)
+                elif self.on_delivered:
+                    self.on_delivered(os.path.basename(post_dir))
+                self.release(post_dir)
+        self.report()
+
+    def release(self, post_dir: str):
+        """Delete a post's files and let another post onto disk"""
+        shutil.rmtree(post_dir, ignore_errors=True)
+        self.disk_slots.release()
+
+    def report(self):
+        self.bot.progress.report(
+            self.chat_id,
+            self.progress_msg.message_id,
+            f"📥 *Instagram Profile Download*\n\n"
+            f"👤 Profile: {self.profile.username}\n"
+            f"🔎 Posts found: {self.found}\n"
+            f"📊 Downloaded: {self.downloaded} posts\n"
+            f"📤 Uploaded: {self.uploaded} files"
+        )
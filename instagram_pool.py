@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import instaloader
+from instaloader.exceptions import (
+    ConnectionException, QueryReturnedForbiddenException, QueryReturnedNotFoundException,
+    TooManyRequestsException
+)
+from requests.adapters import HTTPAdapter
+
+from config import (
+    INSTAGRAM_SESSION_FILE, INSTAGRAM_USERNAME, INSTAGRAM_CONTEXT_POOL,
+    INSTAGRAM_BACKOFF_BASE, INSTAGRAM_BACKOFF_MAX, INSTAGRAM_DOWNLOAD_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+# Same settings for every pooled loader; targets are passed as Path objects
+# so Instaloader keeps the separators
+LOADER_OPTIONS = dict(
+    quiet=True,
+    download_videos=True,
+    download_video_thumbnails=False,
+    download_geotags=False,
+    download_comments=False,
+    save_metadata=False,
+    dirname_pattern='{target}'
+)
+
+
+class KeepAliveContext(instaloader.InstaloaderContext):
+    """Instaloader context that downloads media over one keep-alive session
+
+    Stock Instaloader opens (and closes) a fresh anonymous session for every
+    media file, so each photo or video pays a new TLS handshake.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._media_session = None
+        self._media_lock = threading.Lock()
+
+    def media_session(self):
+        with self._media_lock:
+            if self._media_session is None:
+                session = self.get_anonymous_session()
+                # Profile jobs download several posts through one context at once
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(INSTAGRAM_DOWNLOAD_WORKERS, 10))
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._media_session = session
+            return self._media_session
+
+    def get_raw(self, url: str, _attempt=1):
+        resp = self.media_session().get(url, stream=True)
+        if resp.status_code == 200:
+            resp.raw.decode_content = True
+            return resp
+        resp.close()
+        if resp.status_code == 403:
+            # suspected invalid URL signature
+            raise QueryReturnedForbiddenException("403 when accessing {}.".format(url))
+        if resp.status_code == 404:
+            raise QueryReturnedNotFoundException("404 when accessing {}.".format(url))
+        if resp.status_code == 429:
+            raise TooManyRequestsException("429 when accessing {}.".format(url))
+        raise ConnectionException("HTTP error code {}.".format(resp.status_code))
+
+    def close(self):
+        super().close()
+        if self._media_session is not None:
+            self._media_session.close()
+
+
+class PoolSlot:
+    """One long-lived Instaloader plus its rate-limit backoff state"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.busy = False
+        self.failures = 0
+        self.backoff_until = 0.0
+        self.jobs = 0
+        self.rate_limited = 0
+        self.loader = instaloader.Instaloader(**LOADER_OPTIONS)
+        # Swap in the keep-alive context, reporting 429s back to this slot
+        old_context = self.loader.context
+        self.loader.context = KeepAliveContext(
+            sleep=old_context.sleep,
+            quiet=old_context.quiet,
+            user_agent=old_context.user_agent,
+            max_connection_attempts=old_context.max_connection_attempts,
+            request_timeout=old_context.request_timeout,
+            rate_controller=lambda context: SlotRateController(context, self),
+            fatal_status_codes=old_context.fatal_status_codes,
+            iphone_support=old_context.iphone_support
+        )
+        old_context.close()
+
+    def penalize(self):
+        """Rest this context with exponential backoff after a rate limit"""
+        self.failures += 1
+        self.rate_limited += 1
+        delay = min(INSTAGRAM_BACKOFF_BASE * 2 ** (self.failures - 1), INSTAGRAM_BACKOFF_MAX)
+        self.backoff_until = max(self.backoff_until, time.monotonic() + delay)
+        logger.warning(f"Instagram context {self.index} rate limited, resting {delay}s")
+
+    def succeed(self):
+        self.failures = 0
+
+
+class SlotRateController(instaloader.RateController):
+    """Rate controller that records every 429 on its pool slot"""
+
+    def __init__(self, context, slot: PoolSlot):
+        super().__init__(context)
+        self.slot = slot
+
+    def handle_429(self, query_type: str) -> None:
+        self.slot.penalize()
+        super().handle_429(query_type)
+
+
+class InstagramPool:
+    """Long-lived Instaloader contexts shared by concurrent Instagram jobs
+
+    Each job leases one context for its duration. Contexts keep their HTTP
+    connections and login cookies between jobs, and a context that hit a rate
+    limit is rested (and others preferred) until its backoff expires.
+    """
+
+    def __init__(self, size: int = INSTAGRAM_CONTEXT_POOL, session_file: str = INSTAGRAM_SESSION_FILE,
+                 username: Optional[str] = INSTAGRAM_USERNAME):
+        self.session_file = session_file
+        self.username = username
+        self.slots: List[PoolSlot] = [PoolSlot(index) for index in range(max(size, 1))]
+        self._available: Optional[asyncio.Condition] = None
+
+    def load_sessions(self):
+        """Log every context in with the saved session, if there is one"""
+        if not self.username or not os.path.exists(self.session_file):
+            logger.info("No Instagram session file, using anonymous contexts")
+            return
+        for slot in self.slots:
+            try:
+                slot.loader.load_session_from_file(self.username, self.session_file)
+            except Exception as e:
+                logger.warning(f"Failed to load Instagram session for context {slot.index}: {e}")
+        logger.info(f"Loaded Instagram session for {self.username}")
+
+    def save_session(self):
+        """Persist the (refreshed) login cookies for the next run"""
+        for slot in self.slots:
+            if slot.loader.context.is_logged_in:
+                try:
+                    slot.loader.save_session_to_file(self.session_file)
+                except Exception as e:
+                    logger.warning(f"Failed to save Instagram session: {e}")
+                return
+
+    def close(self):
+        self.save_session()
+        for slot in self.slots:
+            slot.loader.close()
+
+    @asynccontextmanager
+    async def lease(self):
+        """Borrow the least rate-limited idle context for one job"""
+        if self._available is None:
+            self._available = asyncio.Condition()
+        async with self._available:
+            await self._available.wait_for(lambda: any(not slot.busy for slot in self.slots))
+            slot = min((slot for slot in self.slots if not slot.busy), key=lambda slot: slot.backoff_until)
+            slot.busy = True
+        try:
+            delay = slot.backoff_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            slot.jobs += 1
+            yield slot.loader
+        except TooManyRequestsException:
+            slot.penalize()
+            raise
+        else:
+            slot.succeed()
+        finally:
+            async with self._available:
+                slot.busy = False
+                self._available.notify()
+
+    def stats(self) -> dict:
+        """Return a snapshot of the pool state"""
+        now = time.monotonic()
+        return {
+            'contexts': len(self.slots),
+            'busy': sum(slot.busy for slot in self.slots),
+            'resting': sum(slot.backoff_until > now for slot in self.slots),
+            'logged_in': sum(slot.loader.context.is_logged_in for slot in self.slots),
+            'jobs': sum(slot.jobs for slot in self.slots),
+            'rate_limited': sum(slot.rate_limited for slot in self.slots),
+        }
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from config import QUEUE_BACKEND, QUEUE_POLL_INTERVAL, REDIS_URL, WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+REDIS_QUEUE_KEY = 'media-bot:jobs'
+
+
+class SQLiteJobQueue:
+    """The jobs table itself is the queue: workers poll for the oldest queued row
+
+    Needs every process to share DATABASE_PATH (one host or a shared volume).
+    """
+
+    def __init__(self, store, owner: str = WORKER_ID, poll_interval: float = QUEUE_POLL_INTERVAL):
+        self.store = store
+        self.owner = owner
+        self.poll_interval = poll_interval
+
+    async def push(self, job: dict):
+        pass  # a stored job is queued already
+
+    async def pop(self, timeout: float) -> Optional[dict]:
+        """Claim the next job, waiting up to `timeout` seconds for one"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.claim(self.owner)
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self):
+        pass
+
+
+class RedisJobQueue:
+    """Job IDs are pushed to a Redis list so idle workers wake up without polling
+
+    The job records themselves stay in the shared job store; a worker only
+    runs a popped ID if it can still claim the job there.
+    """
+
+    def __init__(self, store, owner: str = WORKER_ID, url: str = REDIS_URL, key: str = REDIS_QUEUE_KEY):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("QUEUE_BACKEND=redis requires the 'redis' package")
+        self.store = store
+        self.owner = owner
+        self.key = key
+        self.client = redis.Redis.from_url(url)
+
+    async def push(self, job: dict):
+        await self.client.lpush(self.key, job['id'])
+
+    async def pop(self, timeout: float) -> Optional[dict]:
+        """Claim the next job, waiting up to `timeout` seconds for one"""
+        item = await self.client.brpop(self.key, timeout=max(1, int(timeout)))
+        if item is None:
+            # Pick up queued jobs whose ID never made it to Redis
+            return self.store.claim(self.owner)
+        job_id = item[1].decode()
+        job = self.store.claim(self.owner, job_id)
+        if job is None:
+            logger.debug(f"Job {job_id} was already claimed or removed")
+        return job
+
+    async def close(self):
+        await self.client.close()
+
+
+def create_job_queue(store, backend: str = QUEUE_BACKEND):
+    """Build the configured job queue"""
+    if backend == 'redis':
+        return RedisJobQueue(store)
+    return SQLiteJobQueue(store)
@@ -0,0 +1,186 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from config import JOB_LEASE, JOB_RETENTION
+
+logger = logging.getLogger(__name__)
+
+# queued -> running -> done | failed; 'queued' and 'running' jobs are resumed on startup
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+UNFINISHED_STATES = ('queued', 'running')
+
+
+class JobStore:
+    """Durable record of download jobs and their state transitions"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " chat_id INTEGER NOT NULL,"
+                " user_id INTEGER NOT NULL,"
+                " params TEXT NOT NULL,"
+                " state TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " message_id INTEGER,"
+                " error TEXT,"
+                " owner TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+            if 'owner' not in columns:
+                self.conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)")
+
+    def create(self, kind: str, chat_id: int, user_id: int, params: dict,
+               message_id: Optional[int] = None) -> dict:
+        """Record a new queued job and return it"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, kind, chat_id, user_id, params, state, message_id, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, chat_id, user_id, json.dumps(params), message_id, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def unfinished(self) -> List[dict]:
+        """Jobs that were queued or running when the bot last stopped, oldest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE state IN (?, ?) ORDER BY created_at", UNFINISHED_STATES
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def claim(self, owner: str, job_id: Optional[str] = None) -> Optional[dict]:
+        """Atomically hand a queued job (the oldest one unless `job_id` is given) to a worker
+
+        Returns None when the job is gone or another worker claimed it first.
+        """
+        if job_id is None:
+            target = "(SELECT id FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1)"
+            args = (owner, time.time())
+        else:
+            target = "?"
+            args = (owner, time.time(), job_id)
+        with self._lock:
+            row = self.conn.execute(
+                f"UPDATE jobs SET state = 'running', owner = ?, updated_at = ?"
+                f" WHERE id = {target} AND state = 'queued' RETURNING *",
+                args
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def owned(self, owner: str) -> List[dict]:
+        """Running jobs claimed by a worker, e.g. before it crashed"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE state = 'running' AND owner = ? ORDER BY created_at", (owner,)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def heartbeat(self, owner: str, job_ids: List[str]):
+        """Renew a worker's lease on the running jobs it still holds"""
+        if not job_ids:
+            return
+        placeholders = ', '.join('?' * len(job_ids))
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE jobs SET updated_at = ? WHERE state = 'running' AND owner = ? AND id IN ({placeholders})",
+                (time.time(), owner, *job_ids)
+            )
+
+    def requeue_expired(self, lease: int = JOB_LEASE) -> List[dict]:
+        """Requeue running jobs whose worker stopped renewing their lease, whoever owned them"""
+        now = time.time()
+        with self._lock:
+            rows = self.conn.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, updated_at = ?"
+                " WHERE state = 'running' AND owner IS NOT NULL AND updated_at < ? RETURNING *",
+                (now, now - lease)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def requeue(self, job_id: str):
+        """Put an interrupted job back on the queue for any worker"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, updated_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def start(self, job_id: str):
+        """Mark a job running and count the attempt"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def set_message(self, job_id: str, message_id: int):
+        """Remember the job's progress message"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET message_id = ?, updated_at = ? WHERE id = ?",
+                (message_id, time.time(), job_id)
+            )
+
+    def set_params(self, job_id: str, params: dict):
+        """Persist a job's updated parameters (e.g. progress a resumed job should skip)"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET params = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(params), time.time(), job_id)
+            )
+
+    def finish(self, job_id: str):
+        self._transition(job_id, 'done')
+
+    def fail(self, job_id: str, error: str):
+        self._transition(job_id, 'failed', error)
+
+    def prune(self, max_age: int = JOB_RETENTION):
+        """Delete finished jobs older than max_age seconds"""
+        with self._lock:
+            deleted = self.conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - max_age,)
+            ).rowcount
+        if deleted:
+            logger.info(f"Pruned {deleted} finished jobs")
+
+    def stats(self) -> dict:
+        """Return the number of jobs in each state"""
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) AS count FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update({row['state']: row['count'] for row in rows})
+        return counts
+
+    def _transition(self, job_id: str, state: str, error: Optional[str] = None):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+                (state, error, time.time(), job_id)
+            )
+
+    @staticmethod
+    def _to_job(row) -> dict:
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
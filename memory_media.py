@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Union
+
+from config import MEMORY_MEDIA_THRESHOLD, MEMORY_MEDIA_BUDGET
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBudget:
+    """Global cap on the bytes of media held in memory at once"""
+
+    def __init__(self, max_bytes: int = MEMORY_MEDIA_BUDGET):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, size: int) -> bool:
+        """Reserve `size` bytes, or return False when the budget is exhausted"""
+        with self._lock:
+            if self.in_use + size > self.max_bytes:
+                return False
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, size: int):
+        with self._lock:
+            self.in_use -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_use': self.in_use,
+                'peak': self.peak,
+                'max_bytes': self.max_bytes,
+                'fallbacks': self.fallbacks,
+            }
+
+
+class MemoryFile:
+    """A downloaded media file held in a budgeted memory buffer"""
+
+    __slots__ = ('name', 'data', '_budget', '_reserved')
+
+    def __init__(self, name: str, data: bytes, budget: MemoryBudget, reserved: int):
+        self.name = name
+        self.data = data
+        self._budget = budget
+        self._reserved = reserved
+
+    def release(self):
+        """Drop the buffer and return its bytes to the budget"""
+        if self._reserved:
+            self._budget.release(self._reserved)
+            self._reserved = 0
+        self.data = b''
+
+
+Media = Union[str, MemoryFile]
+
+
+def media_name(media: Media) -> str:
+    return media.name if isinstance(media, MemoryFile) else os.path.basename(media)
+
+
+def media_size(media: Media) -> int:
+    return len(media.data) if isinstance(media, MemoryFile) else os.path.getsize(media)
+
+
+@contextmanager
+def media_content(media: Media):
+    """Yield something Telegram can upload: the buffer itself or an open file"""
+    if isinstance(media, MemoryFile):
+        yield media.data
+    else:
+        with open(media, 'rb') as file:
+            yield file
+
+
+def release_media(files: List[Media]):
+    for media in files:
+        if isinstance(media, MemoryFile):
+            media.release()
+
+
+def post_media_urls(post) -> List[tuple]:
+    """(url, extension) of every photo/video in an Instagram post, in order"""
+    if post.typename == 'GraphSidecar':
+        return [
+            (node.video_url, '.mp4') if node.is_video else (node.display_url, '.jpg')
+            for node in post.get_sidecar_nodes()
+        ]
+    if post.is_video:
+        return [(post.video_url, '.mp4')]
+    return [(post.url, '.jpg')]
+
+
+def fetch_post_media(loader, post, budget: MemoryBudget,
+                     threshold: int = MEMORY_MEDIA_THRESHOLD) -> Optional[List[MemoryFile]]:
+    """Download a post straight into memory (blocking)
+
+    Returns None, having released anything already fetched, when an item is
+    larger than `threshold`, has no known length or does not fit in the
+    budget; the caller then downloads the post to disk instead.
+    """
+    files: List[MemoryFile] = []
+    complete = False
+    try:
+        for index, (url, ext) in enumerate(post_media_urls(post), 1):
+            resp = loader.context.get_raw(url)
+            with resp:
+                length = int(resp.headers.get('Content-Length') or 0)
+                if not length or length > threshold:
+                    return None
+                if not budget.try_reserve(length):
+                    budget.fallbacks += 1
+                    return None
+                try:
+                    # One read straight into the buffer that gets uploaded
+                    data = resp.raw.read()
+                except BaseException:
+                    budget.release(length)
+                    raise
+            files.append(MemoryFile(f"{post.shortcode}_{index}{ext}", data, budget, length))
+        complete = True
+        return files
+    finally:
+        if not complete:
+            release_media(files)
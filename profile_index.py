@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Set
+
+
+class ProfileIndex:
+    """Persistent record of the profile posts already delivered to each chat"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS delivered_posts ("
+                " profile TEXT NOT NULL,"
+                " chat_id INTEGER NOT NULL,"
+                " shortcode TEXT NOT NULL,"
+                " delivered_at REAL NOT NULL,"
+                " PRIMARY KEY (profile, chat_id, shortcode))"
+            )
+
+    def seen(self, profile: str, chat_id: int) -> Set[str]:
+        """Shortcodes of the profile's posts already sent to the chat"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT shortcode FROM delivered_posts WHERE profile = ? AND chat_id = ?",
+                (profile.lower(), chat_id)
+            ).fetchall()
+        return {row['shortcode'] for row in rows}
+
+    def has_history(self, profile: str, chat_id: int) -> bool:
+        """Whether anything from the profile was delivered to the chat before"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM delivered_posts WHERE profile = ? AND chat_id = ? LIMIT 1",
+                (profile.lower(), chat_id)
+            ).fetchone()
+        return row is not None
+
+    def mark(self, profile: str, chat_id: int, shortcode: str):
+        """Record that a post was delivered to the chat"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO delivered_posts (profile, chat_id, shortcode, delivered_at)"
+                " VALUES (?, ?, ?, ?)",
+                (profile.lower(), chat_id, shortcode, time.time())
+            )
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+
+from config import PROGRESS_UPDATE_INTERVAL
+from ratelimit import Priority
+
+logger = logging.getLogger(__name__)
+
+MessageKey = Tuple[int, int]
+FINISHED_MAX = 4096  # finished messages remembered so late progress reports are dropped
+
+
+class ParallelProgress(ABC):
+    """One progress message for a pipeline that downloads several items at once
+
+    Pipelines call `init_progress()`, pass `hook` (bound to an item key) to
+    yt-dlp, call `item_done()` when an item ends, and provide `summary()`,
+    `bot`, `chat_id`, `progress_msg` and a `failed` count.
+    """
+
+    failed_label = "Failed"
+
+    def init_progress(self):
+        self.active = {}  # item key -> downloaded fraction, updated from worker threads
+        self._lock = threading.Lock()
+
+    def hook(self, key, d: dict):
+        """yt-dlp progress hook of one item (called from worker threads)"""
+        self.bot.check_stopping()
+        if d['status'] != 'downloading':
+            return
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if total:
+            with self._lock:
+                self.active[key] = min(d.get('downloaded_bytes', 0) / total, 1.0)
+            self.report()
+
+    def item_done(self, key):
+        with self._lock:
+            self.active.pop(key, None)
+
+    @abstractmethod
+    def summary(self) -> str:
+        """Message text above the in-progress and failure lines"""
+
+    def report(self):
+        with self._lock:
+            fractions = list(self.active.values())
+        text = self.summary()
+        if fractions:
+            text += f"\n⏳ In progress: {len(fractions)} ({sum(fractions) / len(fractions) * 100:.0f}%)"
+        if self.failed:
+            text += f"\n⚠️ {self.failed_label}: {self.failed}"
+        self.bot.progress.report(self.chat_id, self.progress_msg.message_id, text)
+
+
+class ProgressReporter:
+    """Coalesce progress message edits reported from any thread"""
+
+    def __init__(self, bot, interval: float = PROGRESS_UPDATE_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latest: Dict[MessageKey, str] = {}
+        self._sent: Dict[MessageKey, str] = {}
+        self._last_edit: Dict[MessageKey, float] = {}
+        self._scheduled: Dict[MessageKey, asyncio.TimerHandle] = {}
+        self._inflight: Dict[MessageKey, asyncio.Task] = {}
+        self._finished: 'OrderedDict[MessageKey, None]' = OrderedDict()
+        self.updates_received = 0
+        self.edits_sent = 0
+        self.edits_skipped = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Bind the reporter to the loop that owns the bot"""
+        self._loop = loop
+
+    def report(self, chat_id: int, message_id: int, text: str):
+        """Record the latest text for a message; safe to call from worker threads"""
+        if self._loop is None:
+            return
+        key = (chat_id, message_id)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._update(key, text)
+        else:
+            self._loop.call_soon_threadsafe(self._update, key, text)
+
+    async def finish(self, chat_id: int, message_id: int, text: str, **kwargs):
+        """Send a final edit immediately and forget the message"""
+        key = (chat_id, message_id)
+        # Reports arriving from here on (or already queued by threads) must not overwrite the final text
+        self._close(key)
+        inflight = self._inflight.get(key)
+        if inflight:
+            await asyncio.gather(inflight, return_exceptions=True)
+        last_text = self._sent.pop(key, None)
+        self._last_edit.pop(key, None)
+        if text == last_text and not kwargs:
+            return
+        await self._edit(key, text, **kwargs)
+
+    def forget(self, chat_id: int, message_id: int):
+        """Drop any pending progress for a message without sending it"""
+        key = (chat_id, message_id)
+        self._close(key)
+        inflight = self._inflight.pop(key, None)
+        if inflight:
+            inflight.cancel()
+        self._sent.pop(key, None)
+        self._last_edit.pop(key, None)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the reporter metrics"""
+        return {
+            'received': self.updates_received,
+            'sent': self.edits_sent,
+            'skipped': self.edits_skipped,
+            'tracked': len(self._latest) + len(self._inflight),
+        }
+
+    def _close(self, key: MessageKey):
+        """Stop taking progress for a message and drop what is pending"""
+        self._finished[key] = None
+        self._finished.move_to_end(key)
+        if len(self._finished) > FINISHED_MAX:
+            self._finished.popitem(last=False)
+        handle = self._scheduled.pop(key, None)
+        if handle:
+            handle.cancel()
+        self._latest.pop(key, None)
+
+    def _update(self, key: MessageKey, text: str):
+        """Store the latest text and make sure a flush is scheduled"""
+        self.updates_received += 1
+        if key in self._finished:
+            return
+        self._latest[key] = text
+        if key in self._scheduled or key in self._inflight:
+            return
+        self._schedule(key)
+
+    def _schedule(self, key: MessageKey):
+        """Schedule the next flush no earlier than the edit interval allows"""
+        delay = max(0.0, self._last_edit.get(key, 0.0) + self.interval - time.monotonic())
+        self._scheduled[key] = self._loop.call_later(delay, self._start_flush, key)
+
+    def _start_flush(self, key: MessageKey):
+        """Timer callback that turns a scheduled flush into a task"""
+        self._scheduled.pop(key, None)
+        self._inflight[key] = self._loop.create_task(self._flush(key))
+
+    async def _flush(self, key: MessageKey):
+        """Send the latest text for a message unless it is unchanged"""
+        try:
+            text = self._latest.pop(key, None)
+            if text is None or key in self._finished:
+                return
+            if text == self._sent.get(key):
+                self.edits_skipped += 1
+                return
+            self._sent[key] = text
+            self._last_edit[key] = time.monotonic()
+            # Progress edits are the first thing the rate limiter drops under load
+            await self._edit(key, text, rate_limit_args={'priority': Priority.PROGRESS})
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                self._inflight.pop(key, None)
+            if key in self._latest and key not in self._scheduled and key not in self._finished:
+                self._schedule(key)
+
+    async def _edit(self, key: MessageKey, text: str, **kwargs):
+        """Edit the tracked message, ignoring transient failures"""
+        chat_id, message_id = key
+        kwargs.setdefault('parse_mode', ParseMode.MARKDOWN)
+        try:
+            await self.bot.edit_message_text(text, chat_id, message_id, **kwargs)
+            self.edits_sent += 1
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                logger.debug(f"Progress edit failed for {key}: {e}")
+        except Exception as e:
+            logger.debug(f"Progress edit failed for {key}: {e}")
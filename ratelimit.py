@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_GROUP_PER_MINUTE, RATE_LIMIT_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+PRUNE_EVERY = 1000  # grants between sweeps of idle chat buckets
+
+# Endpoints that deliver the actual media to the user
+UPLOAD_ENDPOINTS = {
+    'sendVideo', 'sendAudio', 'sendDocument', 'sendPhoto', 'sendMediaGroup', 'copyMessage',
+}
+
+
+def normalize_chat_id(chat_id):
+    """Chat IDs as ints, so '-100…' from the environment is the same chat as -100…"""
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return chat_id  # None or an @username
+
+
+class Priority(IntEnum):
+    """Lanes of the outbound queue; lower values are served first"""
+    UPLOAD = 0
+    MESSAGE = 1
+    PROGRESS = 2
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 when one is available now)"""
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, until: float):
+        """Stop handing out tokens until `until` (after a RetryAfter)"""
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0
+
+
+class _Waiter:
+    __slots__ = ('chat_id', 'future')
+
+    def __init__(self, chat_id, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.future = future
+
+
+class TelegramRateLimiter(BaseRateLimiter[dict]):
+    """Global + per-chat token buckets with priority lanes for every Bot API call
+
+    Pass ``rate_limit_args={'priority': Priority.PROGRESS}`` to mark a request
+    as droppable; such requests are discarded instead of queued whenever the
+    chat has no token available.
+    """
+
+    def __init__(self, overall_rate: float = RATE_LIMIT_GLOBAL, chat_rate: float = RATE_LIMIT_PER_CHAT,
+                 chat_burst: float = RATE_LIMIT_CHAT_BURST, group_per_minute: float = RATE_LIMIT_GROUP_PER_MINUTE,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_per_minute / 60
+        self.max_retries = max_retries
+        self._global = TokenBucket(overall_rate, overall_rate)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._lanes: List[Deque[_Waiter]] = [deque() for _ in Priority]
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.waits = {priority: {'count': 0, 'total': 0.0, 'max': 0.0} for priority in Priority}
+        self._grants = 0
+        self.dropped = 0
+        self.retries = 0
+
+    async def initialize(self) -> None:
+        self._wakeup = asyncio.Event()
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for lane in self._lanes:
+            while lane:
+                waiter = lane.popleft()
+                if not waiter.future.done():
+                    waiter.future.cancel()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[dict],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        chat_id = normalize_chat_id(data.get('chat_id'))
+        priority = (rate_limit_args or {}).get('priority')
+        if priority is None:
+            priority = Priority.UPLOAD if endpoint in UPLOAD_ENDPOINTS else Priority.MESSAGE
+
+        if chat_id is not None:
+            if priority == Priority.PROGRESS and not self._has_capacity(chat_id, time.monotonic()):
+                # A newer progress edit will follow; not worth queueing this one
+                self.dropped += 1
+                return True
+            await self._acquire(priority, chat_id)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                delay = float(e.retry_after)
+                logger.warning(f"RetryAfter {delay}s on {endpoint} for chat {chat_id}")
+                until = time.monotonic() + delay
+                if chat_id is None:
+                    self._global.block(until)
+                else:
+                    self._chat_bucket(chat_id).block(until)
+                await asyncio.sleep(delay)
+                if chat_id is not None:
+                    # The retry is a new request and needs its own tokens
+                    await self._acquire(priority, chat_id)
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict:
+        """Return queue-wait metrics per lane plus drop/retry counters"""
+        lanes = {}
+        for priority, wait in self.waits.items():
+            average = wait['total'] / wait['count'] if wait['count'] else 0.0
+            lanes[priority.name.lower()] = {
+                'count': wait['count'],
+                'avg_wait': average,
+                'max_wait': wait['max'],
+                'queued': len(self._lanes[priority]),
+            }
+        return {'lanes': lanes, 'dropped': self.dropped, 'retries': self.retries}
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, 1)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _has_capacity(self, chat_id, now: float) -> bool:
+        """Whether a request for the chat could be sent right away"""
+        if any(waiter.chat_id == chat_id for lane in self._lanes for waiter in lane):
+            return False
+        return self._global.wait_time(now) == 0 and self._chat_bucket(chat_id).wait_time(now) == 0
+
+    async def _acquire(self, priority: Priority, chat_id):
+        """Wait until both the global and the chat bucket grant a token"""
+        now = time.monotonic()
+        if not any(self._lanes) and self._grant(chat_id, now):
+            self._record_wait(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(_Waiter(chat_id, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        await future
+        self._record_wait(priority, time.monotonic() - now)
+
+    def _grant(self, chat_id, now: float) -> bool:
+        """Take a token from both buckets if both have one"""
+        bucket = self._chat_bucket(chat_id)
+        if self._global.wait_time(now) > 0 or bucket.wait_time(now) > 0:
+            return False
+        self._global.take()
+        bucket.take()
+        self._grants += 1
+        if self._grants % PRUNE_EVERY == 0:
+            self._prune(now)
+        return True
+
+    def _record_wait(self, priority: Priority, waited: float):
+        wait = self.waits[priority]
+        wait['count'] += 1
+        wait['total'] += waited
+        wait['max'] = max(wait['max'], waited)
+
+    async def _dispatch(self):
+        """Release queued requests, highest-priority lane first"""
+        while any(self._lanes):
+            now = time.monotonic()
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            released = False
+            soonest = None
+            for lane in self._lanes:
+                for waiter in list(lane):
+                    if waiter.future.done():
+                        lane.remove(waiter)
+                        continue
+                    chat_wait = self._chat_bucket(waiter.chat_id).wait_time(now)
+                    if chat_wait == 0:
+                        lane.remove(waiter)
+                        self._grant(waiter.chat_id, now)
+                        waiter.future.set_result(None)
+                        released = True
+                        break
+                    soonest = chat_wait if soonest is None else min(soonest, chat_wait)
+                if released:
+                    break
+
+            if released or soonest is None:
+                await asyncio.sleep(0)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=soonest)
+            except asyncio.TimeoutError:
+                pass
+
+    def _prune(self, now: float):
+        """Forget buckets of chats that have been idle long enough to be full"""
+        idle = [
+            chat_id for chat_id, bucket in self._chats.items()
+            if bucket.wait_time(now) == 0 and bucket.tokens >= bucket.capacity
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+from config import SCHEDULER_MAX_JOBS, SCHEDULER_PER_USER_JOBS, SCHEDULER_SMALL_JOB_SIZE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_SIZE = 50 * 1024 * 1024  # assumed when the size is unknown
+MIN_JOB_SIZE = 1024 * 1024  # floor so tiny jobs still advance virtual time
+WAIT_SAMPLES = 500  # recent queue waits kept per size class
+
+
+class _Ticket:
+    __slots__ = ('user_id', 'size', 'finish', 'future', 'on_position', 'position', 'enqueued')
+
+    def __init__(self, user_id: int, size: int, finish: float, future: asyncio.Future,
+                 on_position: Optional[Callable[[int], None]]):
+        self.user_id = user_id
+        self.size = size
+        self.finish = finish
+        self.future = future
+        self.on_position = on_position
+        self.position = 0
+        self.enqueued = time.monotonic()
+
+
+class JobScheduler:
+    """Weighted fair queue of download jobs with global and per-user caps
+
+    Each job gets a virtual finish tag of max(virtual time, the user's last
+    tag) + its estimated size in MB; the waiting job with the smallest tag
+    whose user is below the per-user cap runs next. Users therefore share
+    the workers evenly, and small jobs overtake big ones from other users
+    without starving them.
+    """
+
+    def __init__(self, max_jobs: int = SCHEDULER_MAX_JOBS, per_user: int = SCHEDULER_PER_USER_JOBS):
+        self.max_jobs = max_jobs
+        self.per_user = per_user
+        self.virtual_time = 0.0
+        self._last_finish: Dict[int, float] = {}
+        self._running: Dict[int, int] = {}
+        self._waiting: List[_Ticket] = []
+        self._waits = {'small': deque(maxlen=WAIT_SAMPLES), 'large': deque(maxlen=WAIT_SAMPLES)}
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, size: Optional[int] = None,
+                   on_position: Optional[Callable[[int], None]] = None):
+        """Wait for a turn to run a job of `size` estimated bytes
+
+        `on_position` is called with the job's 1-based queue position
+        whenever it changes while the job waits.
+        """
+        size = max(size or DEFAULT_JOB_SIZE, MIN_JOB_SIZE)
+        start = max(self.virtual_time, self._last_finish.get(user_id, 0.0))
+        ticket = _Ticket(user_id, size, start + size / (1024 * 1024),
+                         asyncio.get_running_loop().create_future(), on_position)
+        self._last_finish[user_id] = ticket.finish
+        self._waiting.append(ticket)
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                # A job that never ran should not count against its user
+                if self._last_finish.get(user_id) == ticket.finish:
+                    self._last_finish[user_id] = start
+                self._forget(user_id)
+                self._notify_positions()
+            elif ticket.future.done() and not ticket.future.cancelled():
+                self._release(user_id)
+            raise
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    def _dispatch(self):
+        """Start waiting jobs in finish-tag order while there is capacity"""
+        while self.running < self.max_jobs:
+            eligible = [ticket for ticket in self._waiting if self._running.get(ticket.user_id, 0) < self.per_user]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda ticket: ticket.finish)
+            self._waiting.remove(ticket)
+            self._running[ticket.user_id] = self._running.get(ticket.user_id, 0) + 1
+            self.virtual_time = max(self.virtual_time, ticket.finish)
+            size_class = 'small' if ticket.size <= SCHEDULER_SMALL_JOB_SIZE else 'large'
+            self._waits[size_class].append(time.monotonic() - ticket.enqueued)
+            ticket.future.set_result(None)
+        self._notify_positions()
+
+    def _notify_positions(self):
+        for position, ticket in enumerate(sorted(self._waiting, key=lambda ticket: ticket.finish), 1):
+            if position != ticket.position:
+                ticket.position = position
+                if ticket.on_position:
+                    try:
+                        ticket.on_position(position)
+                    except Exception as e:
+                        logger.debug(f"Queue position callback failed: {e}")
+
+    def _release(self, user_id: int):
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        self._forget(user_id)
+        self._dispatch()
+
+    def _forget(self, user_id: int):
+        """Drop a user's finish tag once it can no longer affect ordering"""
+        if (user_id not in self._running and self._last_finish.get(user_id, 0.0) <= self.virtual_time
+                and not any(ticket.user_id == user_id for ticket in self._waiting)):
+            self._last_finish.pop(user_id, None)
+
+    @staticmethod
+    def _p95(samples) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def stats(self) -> dict:
+        """Return a snapshot of the scheduler state and recent queue waits"""
+        return {
+            'running': self.running,
+            'waiting': len(self._waiting),
+            'users': len(self._running),
+            'small_p95_wait': self._p95(self._waits['small']),
+            'large_p95_wait': self._p95(self._waits['large']),
+        }
@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+import requests
+import yt_dlp
+from requests.adapters import HTTPAdapter
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+
+from config import DOWNLOAD_SEGMENTS, DOWNLOAD_SEGMENT_MIN_SIZE, DOWNLOAD_WORKERS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+SEGMENT_RETRIES = 3
+STATE_SAVE_EVERY = 8 * 1024 * 1024  # bytes between writes of the resume state
+PROGRESS_INTERVAL = 0.5  # seconds between progress hook calls
+THROTTLE_BURST = 0.5  # seconds of traffic allowed ahead of the rate
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Keep-alive session shared by every segmented download"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=DOWNLOAD_WORKERS,
+                                  pool_maxsize=DOWNLOAD_WORKERS * max(DOWNLOAD_SEGMENTS, 1))
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+class Throttle:
+    """Thread-safe byte rate limiter shared by the segments of one download"""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now - THROTTLE_BURST) + amount / self.rate
+            delay = self._next - now - THROTTLE_BURST
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Segment:
+    __slots__ = ('start', 'end', 'done')
+
+    def __init__(self, start: int, end: int, done: int = 0):
+        self.start = start
+        self.end = end  # inclusive
+        self.done = done
+
+    @property
+    def complete(self) -> bool:
+        return self.start + self.done > self.end
+
+
+class SegmentedHttpFD(FileDownloader):
+    """Download one HTTP(S) format as parallel byte ranges into a preallocated file
+
+    Segments write in place with pwrite, so no reassembly pass is needed.
+    Progress per segment is kept next to the .part file, letting a resumed
+    job skip the ranges it already fetched. Servers without range support
+    and small files fall back to yt-dlp's own HTTP downloader.
+    """
+
+    FD_NAME = 'segmented'
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        headers = dict(info_dict.get('http_headers') or {})
+        cookies = self.ydl.cookiejar.get_cookie_header(url)
+        if cookies:
+            headers['Cookie'] = cookies
+        verify = not self.params.get('nocheckcertificate')
+
+        total = self._probe(url, headers, verify)
+        if total is None or total < DOWNLOAD_SEGMENT_MIN_SIZE:
+            return self._fallback(filename, info_dict)
+
+        max_filesize = self.params.get('max_filesize')
+        if max_filesize is not None and total > max_filesize:
+            self.to_screen(
+                f'\r[download] File is larger than max-filesize ({total} bytes > {max_filesize} bytes). Aborting.')
+            return False
+
+        tmpfilename = self.temp_name(filename)
+        state_file = tmpfilename + '.segments'
+        self.report_destination(filename)
+        segments = self._load_state(state_file, total) or self._plan(total)
+
+        fd = os.open(tmpfilename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != total:
+                os.ftruncate(fd, total)
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, total)
+                    except OSError:
+                        pass  # sparse file still works
+            self._run_segments(fd, url, headers, verify, segments, total, filename, tmpfilename,
+                               state_file, info_dict)
+        finally:
+            os.close(fd)
+
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'status': 'finished',
+        }, info_dict)
+        return True
+
+    def _probe(self, url: str, headers: dict, verify: bool) -> Optional[int]:
+        """Return the file size if the server honours range requests"""
+        try:
+            with http_session().get(url, headers={**headers, 'Range': 'bytes=0-0'}, stream=True,
+                                    timeout=self.params.get('socket_timeout') or 20, verify=verify) as resp:
+                content_range = resp.headers.get('Content-Range', '')
+                if resp.status_code != 206 or '/' not in content_range:
+                    return None
+                total = content_range.rsplit('/', 1)[1]
+                return int(total) if total.isdigit() else None
+        except requests.RequestException as e:
+            logger.debug(f"Range probe failed, using a single stream: {e}")
+            return None
+
+    def _fallback(self, filename, info_dict):
+        """Plain single-connection download through yt-dlp"""
+        fd = HttpFD(self.ydl, self.params)
+        fd._progress_hooks = self._progress_hooks
+        return fd.real_download(filename, info_dict)
+
+    @staticmethod
+    def _plan(total: int) -> List[Segment]:
+        count = max(1, min(DOWNLOAD_SEGMENTS, total // DOWNLOAD_SEGMENT_MIN_SIZE or 1))
+        size = -(-total // count)
+        return [Segment(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+    @staticmethod
+    def _load_state(state_file: str, total: int) -> Optional[List[Segment]]:
+        """Resume state left by an interrupted run of this job"""
+        try:
+            with open(state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('total') != total:
+            return None
+        return [Segment(*segment) for segment in state['segments']]
+
+    @staticmethod
+    def _save_state(state_file: str, total: int, segments: List[Segment]):
+        with open(state_file, 'w') as f:
+            json.dump({'total': total, 'segments': [[s.start, s.end, s.done] for s in segments]}, f)
+
+    def _run_segments(self, fd: int, url: str, headers: dict, verify: bool, segments: List[Segment],
+                      total: int, filename: str, tmpfilename: str, state_file: str, info_dict: dict):
+        throttle = Throttle(self.params.get('ratelimit'))
+        abort = threading.Event()
+        errors = []
+
+        def worker(segment: Segment):
+            try:
+                self._fetch(fd, url, headers, verify, segment, throttle, abort)
+            except Exception as e:
+                errors.append(e)
+                abort.set()
+
+        threads = [
+            threading.Thread(target=worker, args=(segment,), daemon=True, name="segment")
+            for segment in segments if not segment.complete
+        ]
+        for thread in threads:
+            thread.start()
+
+        start = time.monotonic()
+        resumed = sum(segment.done for segment in segments)
+        saved = resumed
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(PROGRESS_INTERVAL / len(threads))
+                downloaded = sum(segment.done for segment in segments)
+                elapsed = time.monotonic() - start
+                speed = (downloaded - resumed) / elapsed if elapsed > 0 else None
+                # Progress hooks may raise to cancel the download
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'tmpfilename': tmpfilename,
+                    'filename': filename,
+                    'eta': (total - downloaded) / speed if speed else None,
+                    'speed': speed,
+                    'elapsed': elapsed,
+                }, info_dict)
+                if downloaded - saved >= STATE_SAVE_EVERY:
+                    self._save_state(state_file, total, segments)
+                    saved = downloaded
+        except BaseException:
+            abort.set()
+            for thread in threads:
+                thread.join()
+            self._save_state(state_file, total, segments)
+            raise
+
+        if errors:
+            self._save_state(state_file, total, segments)
+            raise errors[0]
+
+    def _fetch(self, fd: int, url: str, headers: dict, verify: bool, segment: Segment,
+               throttle: Throttle, abort: threading.Event):
+        """Fetch the rest of one segment, retrying from where it stopped"""
+        for attempt in range(SEGMENT_RETRIES + 1):
+            position = segment.start + segment.done
+            try:
+                with http_session().get(url, headers={**headers, 'Range': f'bytes={position}-{segment.end}'},
+                                        stream=True, timeout=self.params.get('socket_timeout') or 20,
+                                        verify=verify) as resp:
+                    if resp.status_code != 206:
+                        raise yt_dlp.utils.DownloadError(f"HTTP {resp.status_code} for byte range {position}-")
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        if abort.is_set():
+                            return
+                        chunk = chunk[:segment.end + 1 - position]
+                        os.pwrite(fd, chunk, position)
+                        position += len(chunk)
+                        segment.done += len(chunk)
+                        throttle.consume(len(chunk))
+                        if segment.complete:
+                            return
+                if segment.complete:
+                    return
+                raise yt_dlp.utils.DownloadError(f"Connection closed at byte {position}")
+            except (requests.RequestException, yt_dlp.utils.DownloadError) as e:
+                if attempt == SEGMENT_RETRIES or abort.is_set():
+                    raise
+                logger.debug(f"Retrying byte range from {position}: {e}")
+                time.sleep(2 ** attempt)
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that fetches plain HTTP(S) formats with SegmentedHttpFD"""
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if (test or subtitle or name == '-' or not info.get('url')
+                or info.get('protocol') not in ('http', 'https')):
+            return super().dl(name, info, subtitle, test)
+
+        fd = SegmentedHttpFD(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from config import DOWNLOAD_TIMEOUT
+from session_store import Session
+
+logger = logging.getLogger(__name__)
+
+WHEEL_SLOTS = 64
+WHEEL_RESOLUTION = 1.0  # seconds per wheel slot
+
+
+class ExpiryWheel:
+    """Hashed timing wheel with O(1) schedule and cancel
+
+    Keys due further out than one revolution land in a slot that comes up
+    early; the owner re-checks the real deadline and schedules them again.
+    """
+
+    def __init__(self, slots: int = WHEEL_SLOTS, resolution: float = WHEEL_RESOLUTION):
+        self.resolution = resolution
+        self._slots: List[Set[int]] = [set() for _ in range(slots)]
+        self._where: Dict[int, int] = {}  # key -> slot index
+        self._tick = math.floor(time.time() / resolution)  # last tick processed
+
+    def schedule(self, key: int, deadline: float):
+        """(Re)schedule a key to come due at `deadline`"""
+        self.cancel(key)
+        tick = max(math.ceil(deadline / self.resolution), self._tick + 1)
+        index = tick % len(self._slots)
+        self._slots[index].add(key)
+        self._where[key] = index
+
+    def cancel(self, key: int):
+        index = self._where.pop(key, None)
+        if index is not None:
+            self._slots[index].discard(key)
+
+    def advance(self, now: float) -> List[int]:
+        """Move the wheel up to `now`, returning the keys of every slot passed"""
+        due = []
+        target = math.floor(now / self.resolution)
+        while self._tick < target:
+            self._tick += 1
+            slot = self._slots[self._tick % len(self._slots)]
+            for key in slot:
+                del self._where[key]
+            due.extend(slot)
+            slot.clear()
+        return due
+
+    def __len__(self):
+        return len(self._where)
+
+
+class SessionManager:
+    """Conversation sessions with idle expiry driven by one reaper task
+
+    Every change to a session renews its deadline. Sessions that run out are
+    removed by the reaper, which hands each tick's expired sessions to
+    `on_expire` in a single call.
+    """
+
+    def __init__(self, store, on_expire: Optional[Callable[[List[Session]], Awaitable[None]]] = None,
+                 timeout: int = DOWNLOAD_TIMEOUT):
+        self.store = store
+        self.on_expire = on_expire
+        self.timeout = timeout
+        self.wheel = ExpiryWheel()
+        self._reaper: Optional[asyncio.Task] = None
+        self.expired = 0
+
+    def start(self):
+        """Start the reaper on the running loop"""
+        self._reaper = asyncio.create_task(self._reap())
+
+    async def stop(self):
+        if self._reaper:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    async def create(self, user_id: int, platform: str, chat_id: int, message_id: Optional[int] = None) -> Session:
+        """Start a new session for the user, replacing any previous one"""
+        session = Session(user_id, platform, chat_id, message_id)
+        await self.save(session)
+        return session
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        return await self.store.get(user_id)
+
+    async def save(self, session: Session):
+        """Store the session and renew its deadline"""
+        session.deadline = time.time() + self.timeout
+        await self.store.put(session)
+        self.wheel.schedule(session.user_id, session.deadline)
+
+    async def end(self, user_id: int):
+        """Forget a finished or abandoned session"""
+        self.wheel.cancel(user_id)
+        await self.store.delete(user_id)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.wheel.resolution)
+            now = time.time()
+            expired = []
+            for user_id in self.wheel.advance(now):
+                session = await self.store.get(user_id)
+                if session is None:
+                    continue
+                if not session.expired(now):
+                    # Early slot of a far deadline, or renewed by another frontend
+                    self.wheel.schedule(user_id, session.deadline)
+                    continue
+                await self.store.delete(user_id)
+                expired.append(session)
+            if expired:
+                self.expired += len(expired)
+                if self.on_expire:
+                    asyncio.create_task(self._notify(expired))
+
+    async def _notify(self, sessions: List[Session]):
+        try:
+            await self.on_expire(sessions)
+        except Exception as e:
+            logger.warning(f"Failed to report {len(sessions)} expired sessions: {e}")
+
+    async def stats(self) -> dict:
+        return {'active': await self.store.count(), 'scheduled': len(self.wheel), 'expired': self.expired}
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from config import SESSION_BACKEND, REDIS_URL
+
+SESSION_MAX_AGE = 3600  # seconds a forgotten session is kept by the shared stores
+REDIS_SESSION_PREFIX = 'media-bot:session:'
+
+
+class Session:
+    """One user's conversation with the bot, from the platform menu to the job"""
+
+    __slots__ = ('user_id', 'platform', 'step', 'chat_id', 'message_id', 'url', 'format', 'qualities',
+                 'urls', 'deadline')
+
+    def __init__(self, user_id: int, platform: str, chat_id: int, message_id: Optional[int] = None,
+                 step: str = 'waiting_link', url: Optional[str] = None, format: Optional[str] = None,
+                 qualities: Optional[dict] = None, urls: Optional[list] = None, deadline: float = 0.0):
+        self.user_id = user_id
+        self.platform = platform
+        self.step = step
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.url = url
+        self.format = format
+        self.qualities = qualities
+        self.urls = urls  # bulk sessions: [{'platform': ..., 'url': ...}]
+        self.deadline = deadline  # wall clock time, shared by all frontends
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) >= self.deadline
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Session':
+        return cls(**data)
+
+
+class MemorySessionStore:
+    """Conversation state of one frontend process"""
+
+    def __init__(self):
+        self._sessions: Dict[int, Session] = {}
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        return self._sessions.get(user_id)
+
+    async def put(self, session: Session):
+        self._sessions[session.user_id] = session
+
+    async def delete(self, user_id: int):
+        self._sessions.pop(user_id, None)
+
+    async def prune(self, max_age: int = SESSION_MAX_AGE):
+        pass
+
+    async def count(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Conversation state shared by the frontends on one host through the bot database"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " user_id INTEGER PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return Session.from_dict(json.loads(row['data'])) if row else None
+
+    async def put(self, session: Session):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)",
+                (session.user_id, json.dumps(session.to_dict()), time.time())
+            )
+
+    async def delete(self, user_id: int):
+        with self._lock:
+            self.conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    async def prune(self, max_age: int = SESSION_MAX_AGE):
+        """Drop sessions a crashed frontend never cleaned up"""
+        with self._lock:
+            self.conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age,))
+
+    async def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class RedisSessionStore:
+    """Conversation state shared by frontends on any host through Redis"""
+
+    def __init__(self, url: str = REDIS_URL):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        data = await self.client.get(f"{REDIS_SESSION_PREFIX}{user_id}")
+        return Session.from_dict(json.loads(data)) if data else None
+
+    async def put(self, session: Session):
+        # Redis expires forgotten sessions itself
+        await self.client.set(
+            f"{REDIS_SESSION_PREFIX}{session.user_id}", json.dumps(session.to_dict()), ex=SESSION_MAX_AGE
+        )
+
+    async def delete(self, user_id: int):
+        await self.client.delete(f"{REDIS_SESSION_PREFIX}{user_id}")
+
+    async def prune(self, max_age: int = SESSION_MAX_AGE):
+        pass
+
+    async def count(self) -> int:
+        return len([key async for key in self.client.scan_iter(f"{REDIS_SESSION_PREFIX}*")])
+
+
+def create_session_store(conn, backend: str = SESSION_BACKEND):
+    """Build the configured session store"""
+    if backend == 'sqlite':
+        return SQLiteSessionStore(conn)
+    if backend == 'redis':
+        return RedisSessionStore()
+    return MemorySessionStore()
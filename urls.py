@@ -0,0 +1,109 @@
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# Links may be pasted with or without a scheme, separated by anything
+MEDIA_URL_PATTERN = re.compile(
+    r'(?:https?://)?(?:[\w-]+\.)*(?:youtube\.com|youtube-nocookie\.com|youtu\.be|instagram\.com|instagr\.am)'
+    r'/[^\s<>"\'(),]+',
+    re.IGNORECASE
+)
+
+YOUTUBE_HOSTS = {'youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com'}
+INSTAGRAM_HOSTS = {'instagram.com', 'm.instagram.com', 'instagr.am'}
+
+YOUTUBE_ID = re.compile(r'^[\w-]{11}$')
+YOUTUBE_PLAYLIST_ID = re.compile(r'^[\w-]{2,}$')
+# /shorts/ID, /embed/ID, /live/ID, /v/ID, /e/ID
+YOUTUBE_PATH_VIDEO = re.compile(r'^/(?:shorts|embed|live|v|e)/([\w-]{11})(?:[/?#]|$)')
+YOUTU_BE_VIDEO = re.compile(r'^/([\w-]{11})(?:[/?#]|$)')
+# /p/CODE, /reel/CODE, /reels/CODE, /tv/CODE, optionally after the author's username
+INSTAGRAM_POST = re.compile(r'^/(?:[\w.]+/)?(?:p|reels?|tv)/([\w-]+)/?$')
+INSTAGRAM_STORY = re.compile(r'^/stories/([\w.]{1,30})/(\d+)/?$')
+INSTAGRAM_PROFILE = re.compile(r'^/([\w.]{1,30})/?$')
+# First path segments that are Instagram pages rather than usernames
+INSTAGRAM_RESERVED = {
+    'about', 'accounts', 'api', 'developer', 'direct', 'explore', 'legal', 'p', 'reel', 'reels', 'stories',
+    'tv', 'web',
+}
+
+
+class MediaKey(NamedTuple):
+    """Canonical identity of a link: every spelling of the same media maps to one key"""
+    platform: str  # 'youtube' or 'instagram'
+    kind: str  # youtube: 'video' | 'playlist'; instagram: 'post' | 'story' | 'profile'
+    id: str  # video/playlist ID, post shortcode, 'username/story ID' or username
+
+    @property
+    def url(self) -> str:
+        """Canonical URL of the media"""
+        if self.platform == 'youtube':
+            if self.kind == 'playlist':
+                return f"https://www.youtube.com/playlist?list={self.id}"
+            return f"https://www.youtube.com/watch?v={self.id}"
+        if self.kind == 'post':
+            return f"https://www.instagram.com/p/{self.id}/"
+        if self.kind == 'story':
+            return f"https://www.instagram.com/stories/{self.id}/"
+        return f"https://www.instagram.com/{self.id}/"
+
+    def __str__(self):
+        return f"{self.platform}:{self.kind}:{self.id}"
+
+
+@lru_cache(maxsize=4096)
+def classify(url: str) -> Optional[MediaKey]:
+    """Classify a YouTube/Instagram link, or return None when it is neither"""
+    url = url.strip()
+    if '://' not in url:
+        url = f"https://{url}"
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if parts.scheme not in ('http', 'https'):
+        return None
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    if host == 'youtu.be':
+        match = YOUTU_BE_VIDEO.match(parts.path)
+        return MediaKey('youtube', 'video', match.group(1)) if match else None
+    if host in YOUTUBE_HOSTS:
+        return _classify_youtube(parts)
+    if host in INSTAGRAM_HOSTS:
+        return _classify_instagram(parts.path)
+    return None
+
+
+def _classify_youtube(parts) -> Optional[MediaKey]:
+    query = parse_qs(parts.query)
+    if parts.path in ('/watch', '/watch/'):
+        # watch?v=ID&list=... is the video; playlists are linked explicitly
+        video_id = (query.get('v') or [''])[0]
+        return MediaKey('youtube', 'video', video_id) if YOUTUBE_ID.match(video_id) else None
+    if parts.path in ('/playlist', '/playlist/'):
+        playlist_id = (query.get('list') or [''])[0]
+        return MediaKey('youtube', 'playlist', playlist_id) if YOUTUBE_PLAYLIST_ID.match(playlist_id) else None
+    match = YOUTUBE_PATH_VIDEO.match(parts.path)
+    return MediaKey('youtube', 'video', match.group(1)) if match else None
+
+
+def _classify_instagram(path: str) -> Optional[MediaKey]:
+    match = INSTAGRAM_POST.match(path)
+    if match:
+        return MediaKey('instagram', 'post', match.group(1))
+    match = INSTAGRAM_STORY.match(path)
+    if match:
+        return MediaKey('instagram', 'story', f"{match.group(1).lower()}/{match.group(2)}")
+    match = INSTAGRAM_PROFILE.match(path)
+    if match and match.group(1).lower() not in INSTAGRAM_RESERVED:
+        return MediaKey('instagram', 'profile', match.group(1).lower())
+    return None
+
+
+def find_media_urls(text: str) -> List[str]:
+    """All YouTube/Instagram links in a message or file, in order of appearance"""
+    return [match.group(0).rstrip('.!?;:') for match in MEDIA_URL_PATTERN.finditer(text)]
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+from typing import NamedTuple, Optional
+
+from config import VIDEO_FASTSTART, VIDEO_THUMBNAILS
+
+logger = logging.getLogger(__name__)
+
+FASTSTART_EXTENSIONS = ('.mp4', '.mov', '.m4v')
+THUMBNAIL_POSITION = 0.1  # fraction of the video to take the thumbnail from, past black intros
+THUMBNAIL_MAX_OFFSET = 10.0  # seconds
+
+
+class VideoMeta(NamedTuple):
+    """What send_video needs so Telegram can show and stream a video without processing it"""
+    duration: int
+    width: int
+    height: int
+    thumbnail: Optional[str] = None  # path of a JPEG thumbnail
+
+
+def meta_from_info(info: dict) -> Optional[VideoMeta]:
+    """Video metadata from a yt-dlp info dict, or None when it is incomplete"""
+    download = (info.get('requested_downloads') or [{}])[0]
+    duration = info.get('duration')
+    width = download.get('width') or info.get('width')
+    height = download.get('height') or info.get('height')
+    if not (duration and width and height):
+        return None
+    return VideoMeta(round(duration), int(width), int(height))
+
+
+async def probe_video(path: str) -> Optional[VideoMeta]:
+    """Video metadata according to ffprobe, or None when the file has no video stream"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+    except OSError as e:
+        logger.warning(f"Failed to run ffprobe on {path}: {e}")
+        return None
+    try:
+        data = json.loads(stdout or b'{}')
+        stream = data['streams'][0]
+        return VideoMeta(round(float(data['format']['duration'])), int(stream['width']), int(stream['height']))
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def moov_first(path: str) -> bool:
+    """Whether an MP4's index (moov box) already comes before its media data (mdat box)"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size, kind = struct.unpack('>I4s', header)
+            if kind == b'moov':
+                return True
+            if kind == b'mdat':
+                return False
+            if size == 1:  # 64-bit size follows the header
+                size = struct.unpack('>Q', f.read(8))[0] - 8
+            elif size < 8:  # 0: box runs to the end of the file
+                return False
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+async def prepare_video(ffmpeg, path: str, info: Optional[dict] = None) -> Optional[VideoMeta]:
+    """Make a downloaded video streamable and collect its metadata for the upload
+
+    Metadata comes from yt-dlp's info when it has it, otherwise from
+    ffprobe. Returns None when the file can't be probed; it is then sent as is.
+    """
+    meta = (info and meta_from_info(info)) or await probe_video(path)
+    if VIDEO_FASTSTART and path.lower().endswith(FASTSTART_EXTENSIONS) and not moov_first(path):
+        try:
+            await ffmpeg.faststart(path, meta.duration if meta else None)
+        except Exception as e:
+            logger.warning(f"Failed to move the index of {path} to the front: {e}")
+    if meta and VIDEO_THUMBNAILS:
+        thumbnail = os.path.splitext(path)[0] + '.thumb.jpg'
+        try:
+            await ffmpeg.thumbnail(path, thumbnail, min(meta.duration * THUMBNAIL_POSITION, THUMBNAIL_MAX_OFFSET))
+            meta = meta._replace(thumbnail=thumbnail)
+        except Exception as e:
+            logger.warning(f"Failed to make a thumbnail of {path}: {e}")
+    return meta
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+from config import (
+    BOT_TOKEN, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONNECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def webhook_secret() -> str:
+    """The configured secret, or one every instance derives from the bot token"""
+    return WEBHOOK_SECRET or hashlib.sha256(BOT_TOKEN.encode()).hexdigest()
+
+
+class WebhookServer:
+    """aiohttp server that feeds Telegram webhook updates into the application
+
+    Besides the webhook endpoint it serves /healthz (process is up) and
+    /readyz (application running and webhook registered) for load balancers.
+    """
+
+    def __init__(self, application, path: str = WEBHOOK_PATH, listen: str = WEBHOOK_LISTEN,
+                 port: int = WEBHOOK_PORT):
+        self.application = application
+        self.path = path
+        self.listen = listen
+        self.port = port
+        self.secret = webhook_secret()
+        self.ready = False
+        self.received = 0
+        self.rejected = 0
+        self._runner = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get('/healthz', self.handle_health)
+        app.router.add_get('/readyz', self.handle_ready)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token, self.secret):
+            self.rejected += 1
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return web.Response(status=400)
+        update = Update.de_json(data, self.application.bot)
+        if update is None:
+            return web.Response(status=400)
+        self.received += 1
+        # Acknowledge at once; handlers run on the application's update queue
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.Response(text='ok')
+
+    async def handle_ready(self, request: web.Request) -> web.Response:
+        if self.ready and self.application.running:
+            return web.Response(text='ready')
+        return web.Response(status=503, text='starting')
+
+    async def start(self):
+        """Start listening and register the webhook with Telegram"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(f"Webhook server listening on {self.listen}:{self.port}{self.path}")
+        if WEBHOOK_URL:
+            await self.application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + self.path,
+                secret_token=self.secret,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=Update.ALL_TYPES
+            )
+        else:
+            logger.warning("WEBHOOK_URL is not set; expecting the webhook to be registered elsewhere")
+        self.ready = True
+
+    async def stop(self):
+        self.ready = False
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> dict:
+        return {'received': self.received, 'rejected': self.rejected}
+
+
+async def serve(bot):
+    """Run the bot in webhook mode until SIGINT/SIGTERM
+
+    Mirrors Application.run_polling's lifecycle, including the post_init
+    and post_shutdown hooks, which only the built-in runners call.
+    """
+    application = bot.app
+    server = WebhookServer(application)
+    bot.webhook = server
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        await stop.wait()
+    finally:
+        logger.info("Stopping webhook server")
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
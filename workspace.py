@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+from config import TEMP_DIR
+
+logger = logging.getLogger(__name__)
+
+MEDIA_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.mp4', '.mov', '.m4a', '.mp3')
+# Files Telegram accepts inside a media group (album)
+ALBUM_PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+ALBUM_VIDEO_EXTENSIONS = ('.mp4', '.mov')
+JOBS_DIR = os.path.join(TEMP_DIR, "jobs")
+SWEEP_MIN_AGE = 3600  # seconds; younger workspaces may belong to another worker's job on a shared volume
+
+
+def natural_key(path: str):
+    """Sort key that orders 'post_2.jpg' before 'post_10.jpg'"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+
+class JobWorkspace:
+    """Private working directory for one download job, removed when the job ends
+
+    A resumable workspace is kept when the job is cancelled (bot shutdown) so
+    a restarted job with the same ID picks up its partial downloads.
+    """
+
+    def __init__(self, job_id: Optional[str] = None, resumable: bool = False):
+        # job_id may be 'parent/child' for a workspace nested in another job's
+        self.job_id = job_id or uuid.uuid4().hex
+        self.path = os.path.join(JOBS_DIR, self.job_id)
+        self.resumable = resumable
+        self.files: List[str] = []
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.resumable and exc_type is asyncio.CancelledError:
+            logger.info(f"Keeping workspace {self.job_id} for resume")
+            return False
+        # Runs on success, errors and task cancellation alike
+        self.cleanup()
+        return False
+
+    def subdir(self, name: str) -> str:
+        """Create and return a directory inside the workspace"""
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def add(self, file_path: str):
+        """Record a file produced by the job"""
+        if file_path and file_path not in self.files:
+            self.files.append(file_path)
+
+    def collect(self, directory: Optional[str] = None, extensions=MEDIA_EXTENSIONS) -> List[str]:
+        """Record and return the media files a downloader left in a workspace directory"""
+        directory = directory or self.path
+        found = []
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.lower().endswith(extensions):
+                    found.append(os.path.join(root, file))
+        found.sort(key=natural_key)
+        for file_path in found:
+            self.add(file_path)
+        return found
+
+    def cleanup(self):
+        """Remove the workspace and everything in it"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    @staticmethod
+    def sweep(keep: Iterable[str] = (), min_age: float = SWEEP_MIN_AGE):
+        """Remove workspaces left behind by a previous run
+
+        Workspaces of jobs in `keep` and any touched in the last `min_age`
+        seconds are left alone.
+        """
+        if not os.path.isdir(JOBS_DIR):
+            return
+        keep = set(keep)
+        cutoff = time.time() - min_age
+        for name in os.listdir(JOBS_DIR):
+            path = os.path.join(JOBS_DIR, name)
+            try:
+                if name in keep or os.path.getmtime(path) > cutoff:
+                    continue
+            except OSError:
+                continue  # removed meanwhile
+            logger.info(f"Removing stale job workspace {name}")
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from config import YOUTUBE_PLAYLIST_LIMIT, YOUTUBE_PLAYLIST_WORKERS
+from progress import ParallelProgress
+
+logger = logging.getLogger(__name__)
+
+
+def entry_url(entry: dict) -> str:
+    """Watch URL of a flat playlist entry"""
+    url = entry.get('url') or entry.get('id')
+    if url and not url.startswith(('http://', 'https://')):
+        url = f"https://www.youtube.com/watch?v={url}"
+    return url
+
+
+class PlaylistPipeline(ParallelProgress):
+    """Stream a YouTube playlist: lazy entry listing -> download workers -> one upload per video
+
+    At most `workers` videos are on disk at any time; each is uploaded and
+    removed as soon as it finishes, while later entries are still being
+    listed. Videos in `skip` (already sent before a restart) are passed over,
+    and `on_delivered` is called with the ID of every video that was sent.
+    """
+
+    failed_label = "Skipped"
+
+    def __init__(self, bot, url: str, chat_id: int, progress_msg, workspace, format_type: str,
+                 ydl_format: str, limit: int = YOUTUBE_PLAYLIST_LIMIT, workers: int = YOUTUBE_PLAYLIST_WORKERS,
+                 skip=None, on_delivered=None):
+        self.bot = bot
+        self.url = url
+        self.chat_id = chat_id
+        self.progress_msg = progress_msg
+        self.workspace = workspace
+        self.format_type = format_type
+        self.ydl_format = ydl_format
+        self.limit = limit
+        self.workers = workers
+        self.skip = skip or set()
+        self.on_delivered = on_delivered
+        self.entries = asyncio.Queue(maxsize=workers)
+        self.title = "Unknown"
+        self.init_progress()
+        self.found = 0
+        self.failed = 0
+        self.uploaded = 0
+
+    async def run(self) -> int:
+        """Run the pipeline to completion, returning the number of videos uploaded"""
+        tasks = [asyncio.create_task(self.enumerate_entries())]
+        tasks += [asyncio.create_task(self.download_worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return self.uploaded
+
+    def list_entries(self):
+        """Open the playlist without resolving its entries (blocking)"""
+        info = self.bot.open_youtube_playlist(self.url)
+        self.title = info.get('title') or self.title
+        # A generator for YouTube: further pages are fetched only as entries are consumed
+        return info.get('entries') or []
+
+    async def enumerate_entries(self):
+        """Producer: feed playlist entries into the bounded queue"""
+        try:
+            position = 0
+            async for entry in self.bot.executor.iterate(self.list_entries):
+                if not entry:
+                    continue
+                position += 1
+                if position > self.limit:
+                    break
+                if entry.get('id') in self.skip:
+                    continue
+                self.found += 1
+                await self.entries.put((position, entry))
+                self.report()
+        finally:
+            for _ in range(self.workers):
+                await self.entries.put(None)
+
+    async def download_worker(self):
+        """Download and upload entries one at a time until the producer is done"""
+        while True:
+            item = await self.entries.get()
+            if item is None:
+                return
+            position, entry = item
+            try:
+                sent = await self.bot.send_youtube_video(
+                    self.workspace, self.workspace.subdir(f"{position:04d}"), entry_url(entry), self.chat_id,
+                    self.format_type, self.ydl_format, lambda d: self.hook(position, d)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to download playlist entry {entry.get('id')}: {e}")
+                sent = False
+            finally:
+                self.item_done(position)
+            if not sent:
+                self.failed += 1
+            else:
+                self.uploaded += 1
+                if entry.get('id') and self.on_delivered:
+                    self.on_delivered(entry['id'])
+            self.report()
+
+    def summary(self) -> str:
+        return (
+            f"📥 *Playlist Download*\n\n"
+            f"📃 Playlist: {self.title}\n"
+            f"🔎 Videos found: {self.found}\n"
+            f"📤 Uploaded: {self.uploaded}"
+        )